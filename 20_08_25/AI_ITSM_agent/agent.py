@@ -1,42 +1,70 @@
 # backend/agent.py
 
 import os
+import sys
 from dotenv import load_dotenv
-from incident_handler import (
-    handle_user_message,
-    handle_user_confirmation
-)
+import reply_stream
+import turn_memo
+from async_utils import run_sync
+from llm_metrics import llm_metrics
+from conversation_state import current_state, transition_report
+from incident_handler import handle_turn_async
+from session_record import SessionState
+from sessions import make_session_store
 
 load_dotenv()
 
-# In-memory session storage for UI/API access
-session_store = {}
+# Conversation state per session_id: in memory, or shared by all workers when
+# SESSION_STORE_URL points at Redis (see sessions.py)
+session_store = make_session_store()
+
+
+async def run_itsm_agent_async(user_input: str, session_id: str) -> str:
+    # One turn at a time per session, in any worker. The session only changes once the
+    # whole reply is done (a streamed turn cancelled halfway leaves it untouched)
+    async with session_store.transaction(session_id) as session:
+        session_state = session.state or SessionState()
+        state_before = current_state(session_state)
+
+        with llm_metrics.turn_scope(session_id) as turn, turn_memo.turn_scope():
+            response, updated_state = await handle_turn_async(user_input, session_state)
+
+        # A turn that didn't move the state machine counts as a plain reply in its state
+        transition_report.record(
+            updated_state.last_transition or (state_before, "reply", current_state(updated_state)),
+            turn.llm_calls,
+        )
+        session.state = updated_state
+    return response
+
 
 def run_itsm_agent(user_input: str, session_id: str) -> str:
-    # Initialize session if not present
-    if session_id not in session_store:
-        session_store[session_id] = {
-            "order_id": None,
-            "container_id": None,
-            "incident_id": None,
-            "awaiting_user_confirmation": False,
-            "last_log": None,
-            "matched_label": None,
-            "known_workaround": None,
-            "escalated": False
-        }
-
-    session_state = session_store[session_id]
-
-    if session_state.get("awaiting_user_confirmation"):
-        response, updated_state = handle_user_confirmation(user_input, session_state)
-    else:
-        response, updated_state = handle_user_message(user_input, session_state)
-
-    session_store[session_id] = updated_state
+    """Blocking wrapper around run_itsm_agent_async for the CLI."""
+    return run_sync(run_itsm_agent_async(user_input, session_id))
+
+
+async def _stream_itsm_agent(user_input: str, session_id: str, on_text) -> str:
+    with reply_stream.streaming(on_text) as stream:
+        response = await run_itsm_agent_async(user_input, session_id)
+    rest = stream.remainder(response)
+    if rest is None:
+        # The streamed text diverged from the final reply: show the reply in full
+        on_text("\n\n" + response)
+    elif rest:
+        on_text(rest)
     return response
 
 
+def stream_itsm_agent(user_input: str, session_id: str, on_text) -> str:
+    """Like run_itsm_agent, but calls on_text with each piece of the reply as it is produced."""
+    return run_sync(_stream_itsm_agent(user_input, session_id, on_text))
+
+
+def _print_token(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
 # CLI Mode
 def main():
     print("🤖 Agent: IT Support Assistant is now online. How can I help you today?")
@@ -48,8 +76,9 @@ def main():
             print("🤖 Agent: Thank you! If you need further assistance, just let me know.")
             break
 
-        response = run_itsm_agent(user_input, session_id)
-        print("🤖 Agent:", response)
+        print("🤖 Agent: ", end="", flush=True)
+        stream_itsm_agent(user_input, session_id, _print_token)
+        print()
 
 
 if __name__ == "__main__":
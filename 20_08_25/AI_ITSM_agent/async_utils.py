@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import weakref
+
+# Single background event loop used to drive the async pipeline from sync callers (CLI, scripts)
+_bridge_loop = None
+_bridge_lock = threading.Lock()
+
+
+def _get_bridge_loop():
+    global _bridge_loop
+    with _bridge_lock:
+        if _bridge_loop is None:
+            _bridge_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bridge_loop.run_forever, name="itsm-sync-bridge", daemon=True).start()
+    return _bridge_loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code and return its result.
+    Must not be called from inside the bridge loop itself.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_bridge_loop())
+    return future.result()
+
+
+def loop_local(factory):
+    """
+    Returns a getter that lazily builds one object per running event loop.
+    Needed for async clients/primitives that must not be shared across loops
+    (the FastAPI loop and the sync bridge loop can both be alive in one process).
+    """
+    instances = weakref.WeakKeyDictionary()
+    lock = threading.Lock()
+
+    def get():
+        loop = asyncio.get_running_loop()
+        with lock:
+            instance = instances.get(loop)
+            if instance is None:
+                instance = factory()
+                instances[loop] = instance
+        return instance
+
+    return get
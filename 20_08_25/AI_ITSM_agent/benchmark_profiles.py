@@ -0,0 +1,105 @@
+# Latency / output-size comparison of the generation profiles in llm_profiles.py.
+#
+#   python benchmark_profiles.py --runs 20
+#   GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=stub python benchmark_profiles.py   (against groq_stub_server.py)
+#
+# "baseline" runs every call site with the "default" profile (one model, temperature 0.7,
+# no max_tokens), "tuned" with its own profile. Prints p50/p95 latency and mean
+# completion tokens per call site and profile.
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import confirmation_rules
+import llm_interface
+import llm_profiles
+from llm_metrics import llm_metrics
+from llm_scheduler import TokenBucket
+
+SAMPLES = {
+    "detect_intent": lambda: llm_interface.detect_intent_async("the label isn't printing for ORD12345"),
+    "user_confirmation": lambda: llm_interface.user_confirmation_async("it's still happening on every box"),
+    "interpret_user_confirmation": lambda: llm_interface.interpret_user_confirmation_async("that worked, thanks"),
+    "classify_issue_intent": lambda: llm_interface.classify_issue_intent_async("can't log in to my account"),
+    "analyze_turn": lambda: llm_interface.analyze_turn_async("label not printing for ORD12345 and CONT5566 pls check"),
+    "extract_ids": lambda: llm_interface.extract_ids_async("order is 12345 and it's in box 778"),
+    "phrase_workaround": lambda: llm_interface.phrase_workaround_async(
+        "Re-print the label from the carrier screen after clearing the printer queue.", "Label Failure"),
+    "draft_email_content": lambda: llm_interface.draft_email_content_async(
+        "User confirmed workaround failed for Order ORD12345. Incident ID: INC-20250819-001143"),
+    "draft_summary_message": lambda: llm_interface.draft_summary_message_async({
+        "incident_id": "INC-20250819-001143", "incident_status": "In Progress",
+        "issue_summary": "Invalid postcode", "order_id": "ORD12345",
+        "workaround": "Correct the postcode in the order and re-print the label.",
+    }),
+}
+
+
+def _completion_tokens(call_site):
+    site = llm_metrics.snapshot()["call_sites"].get(call_site, {})
+    return site.get("completion_tokens", 0), site.get("calls", 0)
+
+
+async def _bench_site(call_site, runs):
+    latencies = []
+    tokens_before, calls_before = _completion_tokens(call_site)
+    for _ in range(runs):
+        start = time.perf_counter()
+        await SAMPLES[call_site]()
+        latencies.append((time.perf_counter() - start) * 1000)
+    tokens_after, calls_after = _completion_tokens(call_site)
+    latencies.sort()
+    calls = max(1, calls_after - calls_before)
+    return {
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "completion_tokens": (tokens_after - tokens_before) / calls,
+    }
+
+
+async def run_benchmark(sites, runs):
+    tuned = llm_profiles.profiles
+    baseline = {"default": tuned["default"]}
+    # Measure the LLM itself: no hedged duplicates, no templated fallbacks, no local classifiers
+    # or confirmation rules answering instead of the LLM,
+    # and no client-side rate limits (the baseline pass would use up the per-minute budget
+    # and every tuned call would wait for the bucket instead)
+    llm_interface.hedge_budget.ratio = 0.0
+    llm_interface.llm_breaker.min_calls = float("inf")
+    llm_interface.local_classifiers.enabled = False
+    confirmation_rules.CONFIRMATION_RULES_MIN_CONFIDENCE = float("inf")
+    llm_interface.llm_scheduler.requests = TokenBucket(1e9)
+    llm_interface.llm_scheduler.tokens = TokenBucket(1e9)
+
+    results = {}
+    for name, table in (("baseline", baseline), ("tuned", tuned)):
+        llm_profiles.profiles = table
+        for site in sites:
+            results[(site, name)] = await _bench_site(site, runs)
+    llm_profiles.profiles = tuned
+    return results
+
+
+def print_results(results, sites):
+    print(f"{'call_site':<30}{'profile':<10}{'model':<22}{'p50_ms':>9}{'p95_ms':>9}{'tokens':>8}")
+    for site in sites:
+        for name in ("baseline", "tuned"):
+            r = results[(site, name)]
+            model = (llm_profiles.PROFILES["default"] if name == "baseline" else llm_profiles.get_profile(site))["model"]
+            print(f"{site:<30}{name:<10}{model:<22}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['completion_tokens']:>8.1f}")
+    speedups = [results[(s, "baseline")]["p50_ms"] / results[(s, "tuned")]["p50_ms"]
+                for s in sites if results[(s, "tuned")]["p50_ms"]]
+    if speedups:
+        print(f"\nMedian p50 speed-up (baseline / tuned): {statistics.median(speedups):.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLM generation profiles per call site")
+    parser.add_argument("--runs", type=int, default=10, help="calls per call site and profile")
+    parser.add_argument("--sites", nargs="*", default=list(SAMPLES), choices=list(SAMPLES))
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args.sites, args.runs))
+    print_results(results, args.sites)
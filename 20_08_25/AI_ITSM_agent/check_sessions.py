@@ -0,0 +1,118 @@
+# Concurrency checks for the session stores (sessions.py).
+#
+#   python redis_stub_server.py --port 6390          # or a real Redis
+#   python check_sessions.py --url redis://localhost:6390/0 --processes 2 --turns 50
+#   python check_sessions.py                         # in-memory store, one process
+#
+# 1. No lost updates: `--processes` worker processes (coroutines for the in-memory store)
+#    each run `--turns` read-modify-write turns on one session, pausing while holding it.
+#    Every turn's append must be in the final state exactly once.
+# 2. Lock renewal: a turn holding the session for 3x the lock TTL still saves.
+# 3. Delete during a turn: delete() waits for the turn, which can't save the session back.
+# Exits with status 1 if a check fails.
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import sys
+import uuid
+
+from session_record import SessionState
+from sessions import InMemorySessionStore, RedisSessionStore
+
+
+def _store(url, prefix, lock_ttl=5.0):
+    return RedisSessionStore(url, prefix=prefix, lock_ttl=lock_ttl) if url else InMemorySessionStore()
+
+
+async def _turns(store, session_id, worker, turns):
+    for turn in range(turns):
+        async with store.transaction(session_id) as session:
+            state = session.state or SessionState(incident_choices=[])
+            appended = state.incident_choices + [f"{worker}-{turn}"]
+            await asyncio.sleep(random.uniform(0, 0.005))  # an LLM call, with the session held
+            state.incident_choices = appended
+            session.state = state
+
+
+def _worker(url, prefix, session_id, worker, turns):
+    asyncio.run(_turns(_store(url, prefix), session_id, worker, turns))
+
+
+async def _read(store, session_id):
+    async with store.transaction(session_id) as session:
+        return session.state
+
+
+async def check_no_lost_updates(url, prefix, processes, turns):
+    store = _store(url, prefix)
+    session_id = "counter"
+    if url:
+        spawn = multiprocessing.get_context("spawn")  # fresh interpreters, not forks of this event loop
+        workers = [spawn.Process(target=_worker, args=(url, prefix, session_id, w, turns))
+                   for w in range(processes)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        if any(process.exitcode for process in workers):
+            return False, "a worker process failed"
+    else:
+        await asyncio.gather(*(_turns(store, session_id, w, turns) for w in range(processes)))
+    appends = (await _read(store, session_id)).incident_choices
+    expected = {f"{w}-{t}" for w in range(processes) for t in range(turns)}
+    ok = len(appends) == len(expected) and set(appends) == expected
+    return ok, f"{len(appends)} appends stored, {len(expected)} expected"
+
+
+async def check_lock_renewal(url, prefix):
+    if not url:
+        return True, "skipped (in-memory locks don't expire)"
+    store = _store(url, prefix, lock_ttl=0.3)
+    async with store.transaction("slow") as session:
+        await asyncio.sleep(0.9)
+        session.state = SessionState(last_user_message="slow turn")
+    saved = await _read(store, "slow")
+    ok = saved is not None and saved.last_user_message == "slow turn"
+    return ok, f"saved after 0.9s under a 0.3s lock TTL ({store.stats['lock_renewals']} renewals)"
+
+
+async def check_delete_during_turn(url, prefix):
+    store = _store(url, prefix)
+
+    async def turn():
+        async with store.transaction("ending") as session:
+            await asyncio.sleep(0.2)
+            session.state = SessionState(last_user_message="late save")
+
+    running = asyncio.create_task(turn())
+    await asyncio.sleep(0.05)
+    await store.delete("ending")
+    await running
+    exists = await store.exists("ending")
+    return not exists, "session gone after delete" if not exists else "the turn saved the session back"
+
+
+async def run_checks(url, processes, turns):
+    prefix = f"check:{uuid.uuid4().hex[:8]}:"
+    checks = [
+        ("no lost updates", check_no_lost_updates(url, prefix, processes, turns)),
+        ("lock renewal", check_lock_renewal(url, prefix)),
+        ("delete during a turn", check_delete_during_turn(url, prefix)),
+    ]
+    failed = 0
+    for name, check in checks:
+        ok, detail = await check
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency checks for the session stores")
+    parser.add_argument("--url", help="redis://... (default: the in-memory store)")
+    parser.add_argument("--processes", type=int, default=2, help="concurrent writers to one session")
+    parser.add_argument("--turns", type=int, default=50, help="turns per writer")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(run_checks(args.url, args.processes, args.turns)) else 0)
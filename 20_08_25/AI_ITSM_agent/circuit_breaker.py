@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", 20))              # recent calls considered
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 5))         # don't judge on fewer calls
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5))
+LLM_BREAKER_SLOW_MS = float(os.getenv("LLM_BREAKER_SLOW_MS", 10000))        # a call slower than this is "slow"
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", 0.5))
+LLM_BREAKER_OPEN_S = float(os.getenv("LLM_BREAKER_OPEN_S", 30))            # wait before probing again
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the breaker is open."""
+
+
+_CALL = object()  # ticket for an ordinary call (breaker closed)
+
+
+class CircuitBreaker:
+    """
+    Trips when, over the last `window` calls (at least `min_calls`), the error rate
+    or the share of calls slower than `slow_ms` reaches its threshold.
+    While open every call is refused for `open_s` seconds; then one probe call is let
+    through (half-open). A healthy probe closes the breaker, a failed/slow one re-opens it.
+    Only the probe's own ticket decides: calls that started before the trip and finish
+    while half-open change nothing.
+    """
+
+    def __init__(self, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS,
+                 error_rate=LLM_BREAKER_ERROR_RATE, slow_ms=LLM_BREAKER_SLOW_MS,
+                 slow_rate=LLM_BREAKER_SLOW_RATE, open_s=LLM_BREAKER_OPEN_S):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_ms = slow_ms
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probe = None  # ticket of the half-open probe in flight
+        self._lock = threading.Lock()
+        self.stats = {"trips": 0, "short_circuited": 0, "probes": 0, "fallbacks": 0}
+
+    def allow(self):
+        """
+        A ticket if a call may go to the LLM now, None if not. Every ticket must be
+        handed back to record() or release().
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_s:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return _CALL
+            if self.state == HALF_OPEN and self._probe is None:
+                self._probe = object()
+                self.stats["probes"] += 1
+                return self._probe
+            self.stats["short_circuited"] += 1
+            return None
+
+    def record(self, ticket, failed, latency_ms=0.0):
+        slow = not failed and latency_ms >= self.slow_ms
+        with self._lock:
+            if ticket is not _CALL:
+                if ticket is self._probe:
+                    self._probe = None
+                    if failed or slow:
+                        self._trip()
+                    else:
+                        self.state = CLOSED
+                        self._outcomes.clear()
+                        print("✅ LLM circuit closed, probe call succeeded")
+                return
+            if self.state == CLOSED:
+                self._outcomes.append((failed, slow))
+                if self._should_trip():
+                    self._trip()
+
+    def release(self, ticket):
+        """An allowed call was cancelled before it finished: frees the probe slot if it was the probe."""
+        with self._lock:
+            if ticket is self._probe:
+                self._probe = None
+
+    def _should_trip(self):
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return False
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+        return failures / calls >= self.error_rate or slow / calls >= self.slow_rate
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.stats["trips"] += 1
+        print(f"🚫 LLM circuit open, serving templated replies for {self.open_s:.0f}s")
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, **self.stats}
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+from typing import Optional, Tuple
+
+# Deterministic parser for replies to the two confirmation questions:
+#   workaround: "Did the workaround resolve the issue?"  -> success / failure / unclear
+#   issue:      "Do you still notice an issue?"          -> issue_persists / issue_resolved / unclear
+# Handles the replies seen in the flow room, e.g.:
+#   "yes it worked", "nope still failing", "all good thanks 👍", "didnt help",
+#   "not happening anymore", "it worked but now it's failing again", "not sure"
+# Explicit wording about the issue ("still failing", "fixed") wins over a bare yes/no,
+# whose meaning depends on the question. Below CONFIRMATION_RULES_MIN_CONFIDENCE the
+# caller asks the LLM.
+
+CONFIRMATION_RULES_MIN_CONFIDENCE = float(os.getenv("CONFIRMATION_RULES_MIN_CONFIDENCE", 0.85))
+
+CONFIDENT = 0.98       # explicit wording, agreeing with any yes/no
+EXPLICIT = 0.95        # explicit wording only
+BARE = 0.9             # only a yes / no
+HEDGED = 0.9           # "not sure", "maybe": the answer is unclear
+CONTRAST = 0.85        # "worked but now failing": the last clause wins
+CONFLICT = 0.5         # explicit wording contradicts the yes / no
+NOTHING_FOUND = 0.0
+
+_EMOJI = [
+    (re.compile("[👍👌✅✔🙌🎉🥳💯😊🙂😀😃😄😁]"), " good "),
+    (re.compile("[👎❌✖😞😢😭😡😠🙁☹😩😫]"), " bad "),
+]
+
+_TYPOS = {
+    "yess": "yes", "yea": "yes", "yeah": "yes", "yah": "yes", "ya": "yes", "yep": "yes", "yup": "yes",
+    "yas": "yes", "ye": "yes", "y": "yes", "sure": "yes", "correct": "yes", "affirmative": "yes",
+    "noo": "no", "nope": "no", "nop": "no", "nah": "no", "na": "no", "n": "no", "negative": "no",
+    "didnt": "didn't", "doesnt": "doesn't", "isnt": "isn't", "wasnt": "wasn't", "wont": "won't", "cant": "can't",
+    "dont": "don't", "havent": "haven't", "aint": "ain't",
+    "wrked": "worked", "workd": "worked", "wroked": "worked", "worke": "worked", "wokred": "worked",
+    "wrks": "works", "wroks": "works", "wrking": "working", "wokring": "working", "workign": "working",
+    "fixd": "fixed", "fxed": "fixed", "reslved": "resolved", "resolvd": "resolved",
+    "stil": "still", "stll": "still", "sitll": "still",
+    "failng": "failing", "faling": "failing", "fialing": "failing", "faild": "failed",
+    "thnks": "thanks", "thanx": "thanks", "thx": "thanks", "ty": "thanks", "tnx": "thanks",
+    "gud": "good", "gd": "good", "ok": "okay", "k": "okay", "kk": "okay", "okk": "okay",
+}
+
+_NEGATORS = {"not", "no", "never", "didn't", "doesn't", "isn't", "wasn't", "won't", "can't", "don't", "haven't",
+             "ain't", "without", "nothing", "neither", "nor", "hardly"}
+
+# Words saying the issue is gone / still there (flipped when negated)
+_FIXED_WORDS = {"worked", "works", "working", "fixed", "resolved", "solved", "sorted", "helped", "fine", "good",
+                "great", "perfect", "awesome", "success", "successful", "gone", "cleared", "better", "printed",
+                "printing", "packed"}
+_BROKEN_WORDS = {"still", "failing", "failed", "fails", "fail", "broken", "persists", "persist", "persisting",
+                 "same", "happening", "occurring", "stuck", "bad", "wrong"}
+# Only meaningful negated: "didn't work", "didn't help"
+_FIXED_IF_NEGATED = {"work", "help"}
+# The issue itself: counts only when nothing else in the clause says what happened to it
+# ("no issues" / "error" vs "the issue is resolved")
+_ISSUE_NOUNS = {"issue", "issues", "problem", "problems", "error", "errors", "down"}
+
+_YES_WORDS = {"yes"}
+_NO_WORDS = {"no"}
+
+_HEDGES = re.compile(r"\b(not sure|unsure|maybe|perhaps|idk|i don't know|dunno|no idea|can't tell|kind of|"
+                     r"sort of|partly|partially|sometimes|let me check|will check|checking)\b")
+_CONTRAST = re.compile(r"\b(but|however|though|although|yet|except)\b")
+_CLAUSE = re.compile(r"[.,;!?\n]+|\b(?:but|however|though|although|and|then|except)\b")
+_WORD = re.compile(r"[a-z']+")
+
+_NEGATION_WINDOW = 3
+
+
+def _normalise(text):
+    text = (text or "").lower().replace("’", "'")
+    for pattern, word in _EMOJI:
+        text = pattern.sub(word, text)
+    text = re.sub(r"(.)\1{2,}", r"\1\1", text)  # "yesss" -> "yess", "nooo" -> "noo"
+    text = re.sub(r"\bno longer\b", "not", text)
+    text = re.sub(r"\b(all good|no worries|all set)\b", "good", text)
+    return text
+
+
+def _clause_states(clause):
+    """(state, polarity) for one clause: state 'fixed' / 'broken' / None, polarity 'yes' / 'no' / None."""
+    words = [_TYPOS.get(w, w) for w in _WORD.findall(clause)]
+    polarity = None
+    if words and words[0] in _YES_WORDS | _NO_WORDS:
+        # "no issues" negates; a lone "no" / "no, ..." / "nope still failing" answers the question
+        is_negator = words[0] in _NO_WORDS and len(words) > 1 and words[1] in _ISSUE_NOUNS
+        if not is_negator:
+            polarity = "yes" if words[0] in _YES_WORDS else "no"
+            words = words[1:]
+
+    states, noun_states = set(), set()
+    negated_until = -1
+    for i, word in enumerate(words):
+        if word in _NEGATORS:
+            negated_until = i + _NEGATION_WINDOW
+            continue
+        negated = i <= negated_until
+        if word in _FIXED_WORDS or (word in _FIXED_IF_NEGATED and negated):
+            states.add("broken" if negated else "fixed")
+        elif word in _BROKEN_WORDS:
+            states.add("fixed" if negated else "broken")
+        elif word in _ISSUE_NOUNS:
+            noun_states.add("fixed" if negated else "broken")
+
+    states = states or noun_states
+    if len(states) == 1:
+        return states.pop(), polarity
+    return ("conflict" if states else None), polarity
+
+
+def parse_reply(reply_text) -> Tuple[Optional[str], Optional[str], float]:
+    """
+    (state, polarity, confidence) where state is 'fixed', 'broken', 'unclear' or None
+    (nothing explicit) and polarity the bare 'yes' / 'no' the reply starts with, if any.
+    """
+    text = _normalise(reply_text)
+    if _HEDGES.search(text):
+        return "unclear", None, HEDGED
+
+    clauses = [c for c in _CLAUSE.split(text) if c and c.strip()]
+    states, polarity = [], None
+    for clause in clauses:
+        state, clause_polarity = _clause_states(clause)
+        polarity = polarity or clause_polarity
+        if state == "conflict":
+            return None, polarity, NOTHING_FOUND
+        if state and (not states or states[-1] != state):
+            states.append(state)
+
+    if not states:
+        return None, polarity, BARE if polarity else NOTHING_FOUND
+    if len(states) == 1:
+        return states[0], polarity, EXPLICIT
+    if _CONTRAST.search(text):
+        return states[-1], polarity, CONTRAST  # "worked but now failing again"
+    return None, polarity, NOTHING_FOUND
+
+
+class ReplyParserStats:
+    """How often the rules answered a confirmation reply without the LLM, per question."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"workaround": {"calls": 0, "fast_path": 0}, "issue": {"calls": 0, "fast_path": 0}}
+
+    def record(self, question, fast_path):
+        with self._lock:
+            self._counts[question]["calls"] += 1
+            self._counts[question]["fast_path"] += fast_path
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                question: {**counts, "hit_rate": round(counts["fast_path"] / counts["calls"], 3) if counts["calls"] else None}
+                for question, counts in self._counts.items()
+            }
+
+
+reply_parser_stats = ReplyParserStats()
+
+
+def _classify(reply_text, yes_means, labels):
+    """labels: (label when fixed, label when broken, unclear label)."""
+    fixed_label, broken_label, unclear_label = labels
+    state, polarity, confidence = parse_reply(reply_text)
+    answer = {"fixed": fixed_label, "broken": broken_label, "unclear": unclear_label}.get(state)
+    if polarity:
+        bare = fixed_label if (polarity == "yes") == (yes_means == "fixed") else broken_label
+        if answer is None:
+            answer = bare
+        elif state != "unclear":
+            confidence = CONFIDENT if answer == bare else CONFLICT
+    return answer or unclear_label, confidence
+
+
+def workaround_reply(reply_text):
+    """(success / failure / unclear, confidence) for "Did the workaround resolve the issue?"."""
+    return _classify(reply_text, yes_means="fixed", labels=("success", "failure", "unclear"))
+
+
+def issue_reply(reply_text):
+    """(issue_resolved / issue_persists / unclear, confidence) for "Do you still notice an issue?"."""
+    return _classify(reply_text, yes_means="broken", labels=("issue_resolved", "issue_persists", "unclear"))
+
+
+def fast_path(question, reply_text):
+    """
+    The rules' label for `question` ("workaround" / "issue") when they are confident
+    enough, else None (ask the LLM). Counted in reply_parser_stats.
+    """
+    label, confidence = (workaround_reply if question == "workaround" else issue_reply)(reply_text)
+    hit = confidence >= CONFIRMATION_RULES_MIN_CONFIDENCE
+    reply_parser_stats.record(question, hit)
+    return label if hit else None
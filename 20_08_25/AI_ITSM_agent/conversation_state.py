@@ -0,0 +1,82 @@
+import threading
+from collections import defaultdict
+
+# Conversation state machine for a chat session.
+#
+# session_state.state says what the agent is waiting for and the transition table
+# lists every legal move; incident_handler dispatches on the state (STATE_HANDLERS)
+# and calls transition().
+#
+#   idle ──workaround_suggested──> awaiting_workaround_confirmation ──worked / failed──> idle
+#   idle ──success_log_found─────> awaiting_success_confirmation ──persists / resolved──> idle
+#   idle ──multiple_incidents────> awaiting_incident_choice ──incident_chosen──> idle
+#   (an unclear reply keeps the waiting state)
+
+IDLE = "idle"
+AWAITING_WORKAROUND_CONFIRMATION = "awaiting_workaround_confirmation"
+AWAITING_SUCCESS_CONFIRMATION = "awaiting_success_confirmation"
+AWAITING_INCIDENT_CHOICE = "awaiting_incident_choice"
+
+# (state, event) -> next state
+TRANSITIONS = {
+    (IDLE, "reply"): IDLE,
+    (IDLE, "workaround_suggested"): AWAITING_WORKAROUND_CONFIRMATION,
+    (IDLE, "success_log_found"): AWAITING_SUCCESS_CONFIRMATION,
+    (IDLE, "multiple_incidents"): AWAITING_INCIDENT_CHOICE,
+
+    (AWAITING_WORKAROUND_CONFIRMATION, "workaround_worked"): IDLE,
+    (AWAITING_WORKAROUND_CONFIRMATION, "workaround_failed"): IDLE,
+    (AWAITING_WORKAROUND_CONFIRMATION, "unclear"): AWAITING_WORKAROUND_CONFIRMATION,
+
+    (AWAITING_SUCCESS_CONFIRMATION, "issue_persists"): IDLE,
+    (AWAITING_SUCCESS_CONFIRMATION, "issue_resolved"): IDLE,
+    (AWAITING_SUCCESS_CONFIRMATION, "unclear"): AWAITING_SUCCESS_CONFIRMATION,
+
+    (AWAITING_INCIDENT_CHOICE, "incident_chosen"): IDLE,
+    (AWAITING_INCIDENT_CHOICE, "invalid_choice"): AWAITING_INCIDENT_CHOICE,
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def current_state(session_state):
+    return session_state.state or IDLE
+
+
+def transition(session_state, event):
+    """Moves the session along `event`; raises InvalidTransition if the table has no such move."""
+    state = current_state(session_state)
+    next_state = TRANSITIONS.get((state, event))
+    if next_state is None:
+        raise InvalidTransition(f"No transition from {state} on {event}")
+    session_state.state = next_state
+    session_state.last_transition = (state, event, next_state)
+    return next_state
+
+
+class TransitionReport:
+    """Turns and LLM calls per transition, to see which conversation steps cost LLM time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = defaultdict(lambda: {"turns": 0, "llm_calls": 0, "max_llm_calls": 0})
+
+    def record(self, transition_taken, llm_calls):
+        state, event, next_state = transition_taken
+        with self._lock:
+            row = self._rows[f"{state} --{event}--> {next_state}"]
+            row["turns"] += 1
+            row["llm_calls"] += llm_calls
+            row["max_llm_calls"] = max(row["max_llm_calls"], llm_calls)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**row, "avg_llm_calls": round(row["llm_calls"] / row["turns"], 2)}
+                for name, row in self._rows.items()
+            }
+
+
+transition_report = TransitionReport()
@@ -1,9 +1,13 @@
 import os
-from typing import Optional 
+from typing import Optional
 import mysql.connector
 from datetime import datetime
 from dotenv import load_dotenv
 
+from db_pool import ConnectionPool
+from known_failures_cache import KnownFailuresCache
+from turn_memo import invalidate, turn_memoized
+
 # Load .env file if present
 load_dotenv()
 
@@ -16,165 +20,200 @@ def connect_db():
     )
 
 
-def get_latest_log(order_id=None, container_id=None):
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
+# Shared pool used by every query below (size/timeout via DB_POOL_SIZE / DB_POOL_TIMEOUT)
+db_pool = ConnectionPool(connect_db)
 
-    if order_id:
-        cursor.execute("SELECT * FROM cms_logs WHERE order_id = %s ORDER BY response_timestamp DESC LIMIT 1", (order_id,))
-    elif container_id:
-        cursor.execute("SELECT * FROM cms_logs WHERE container_id = %s ORDER BY response_timestamp DESC LIMIT 1", (container_id,))
-    else:
+
+def pooled_connection():
+    """Borrow a connection from the shared pool; always returned on exit, even on errors."""
+    return db_pool.connection()
+
+
+def get_pool_stats():
+    return db_pool.stats()
+
+
+@turn_memoized("cms_logs")
+def get_latest_log(order_id=None, container_id=None):
+    if not order_id and not container_id:
         return None
 
-    print("ORDER ID:", order_id)
-    print("CONTAINER ID:", container_id)
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
 
-    result = cursor.fetchone()
-    conn.close()
+        if order_id:
+            cursor.execute("SELECT * FROM cms_logs WHERE order_id = %s ORDER BY response_timestamp DESC LIMIT 1", (order_id,))
+        else:
+            cursor.execute("SELECT * FROM cms_logs WHERE container_id = %s ORDER BY response_timestamp DESC LIMIT 1", (container_id,))
+
+        print("ORDER ID:", order_id)
+        print("CONTAINER ID:", container_id)
+
+        result = cursor.fetchone()
+        cursor.close()
     return result
 
-def find_known_failure_match(response_payload):
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("SELECT pattern, workaround, failure_type  FROM known_failures")
-    failures = cursor.fetchall()
-    conn.close()
-
-    # Handle null payload first
-    if response_payload is None:
-        for failure in failures:
-            if failure["pattern"] is None:  # Matches NULL pattern in DB
-                return failure
-        return None
+def _load_known_failures():
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM known_failures ORDER BY id")
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
 
-    # Normal matching for non-null payload
-    for failure in failures:
-        if failure["pattern"] is None:
-            continue  # Skip null patterns for non-null payloads
 
-        cleaned_pattern = failure["pattern"].replace('%', '').strip().lower()
-        if cleaned_pattern in response_payload.lower():
-            return failure
+def _load_workaround_phrasings():
+    try:
+        with pooled_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT failure_type, workaround, phrasing FROM workaround_phrasings ORDER BY id")
+            rows = cursor.fetchall()
+            cursor.close()
+    except mysql.connector.errors.ProgrammingError:
+        return []  # table not created yet (see known_failures.py)
+    return rows
 
-    return None
 
+def _known_failures_version():
+    # CHECKSUM TABLE is cheap for small tables and changes on any insert/update/delete
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("CHECKSUM TABLE known_failures, workaround_phrasings")
+        rows = cursor.fetchall()
+        cursor.close()
+    return tuple(row[1] for row in rows)
 
-def log_incident(order_id, container_id, issue_summary):
-    conn = connect_db()
-    cursor = conn.cursor()
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    incident_id = f"INC-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+# In-memory snapshot of known_failures + precomputed phrasings (refreshed on change, see known_failures_cache.py)
+known_failures_cache = KnownFailuresCache(_load_known_failures, _known_failures_version, _load_workaround_phrasings)
 
-    cursor.execute("""
-        INSERT INTO incident_logs (incident_id, order_id, container_id, issue_summary, status, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s)
-    """, (incident_id, order_id, container_id, issue_summary, 'In Progress', timestamp))
 
-    conn.commit()
-    conn.close()
+def reload_known_failures():
+    """Force a reload of the known_failures snapshot (e.g. after inserting new patterns)."""
+    return known_failures_cache.reload()
 
-    return incident_id
+
+def find_known_failure_match(response_payload):
+    """
+    Returns the highest-priority (lowest id) known_failures row whose LIKE pattern matches
+    the CMS response, or None. See failure_matcher.py for the matching rules.
+    """
+    return known_failures_cache.snapshot().matcher.match(response_payload)
 
 
-def update_incident_status(incident_id, status):
-    conn = connect_db()
-    cursor = conn.cursor()
+def get_precomputed_phrasing(failure):
+    """A ready-made phrasing for a matched known_failures row, or None if none was generated yet."""
+    return known_failures_cache.snapshot().get_phrasing(failure.get("failure_type"), failure.get("workaround"))
 
-    cursor.execute("""
-        UPDATE incident_logs
-        SET status = %s
-        WHERE incident_id = %s
-    """, (status, incident_id))  # ✅ Removed updated_at
 
-    conn.commit()
-    conn.close()
+def log_incident(order_id, container_id, issue_summary):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    incident_id = f"INC-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
 
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO incident_logs (incident_id, order_id, container_id, issue_summary, status, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (incident_id, order_id, container_id, issue_summary, 'In Progress', timestamp))
+        conn.commit()
+        cursor.close()
+    invalidate("incident_logs")
 
-def get_workaround_by_label(label):
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
+    return incident_id
 
-    cursor.execute("SELECT workaround FROM known_failures WHERE label = %s", (label,))
-    row = cursor.fetchone()
-    conn.close()
 
+def update_incident_status(incident_id, status):
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE incident_logs
+            SET status = %s
+            WHERE incident_id = %s
+        """, (status, incident_id))  # ✅ Removed updated_at
+        conn.commit()
+        cursor.close()
+    invalidate("incident_logs")
+
+
+def get_workaround_by_label(label):
+    row = known_failures_cache.snapshot().by_label.get(label)
     return row['workaround'] if row else None
 
 
 # --- ADD in db_interface.py ---
 
+@turn_memoized("incident_logs")
 def get_incident_by_id(incident_id):
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM incident_logs WHERE incident_id = %s LIMIT 1", (incident_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM incident_logs WHERE incident_id = %s LIMIT 1", (incident_id,))
+        row = cursor.fetchone()
+        cursor.close()
     return row
 
+@turn_memoized("cms_logs")
 def order_exists(order_id):
     if not order_id:
         return False
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM cms_logs WHERE order_id = %s LIMIT 1", (order_id,))
-    found = cursor.fetchone() is not None
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM cms_logs WHERE order_id = %s LIMIT 1", (order_id,))
+        found = cursor.fetchone() is not None
+        cursor.close()
     return found
 
+@turn_memoized("cms_logs")
 def container_exists(container_id):
     if not container_id:
         return False
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM cms_logs WHERE container_id = %s LIMIT 1", (container_id,))
-    found = cursor.fetchone() is not None
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM cms_logs WHERE container_id = %s LIMIT 1", (container_id,))
+        found = cursor.fetchone() is not None
+        cursor.close()
     return found
 
+@turn_memoized("incident_logs")
 def get_latest_incident_by_order_or_container(order_id=None, container_id=None):
     if not order_id and not container_id:
         return None
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
-    if order_id and container_id:
-        cursor.execute("""
-            SELECT * FROM incident_logs
-            WHERE order_id = %s OR container_id = %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (order_id, container_id))
-    elif order_id:
-        cursor.execute("""
-            SELECT * FROM incident_logs
-            WHERE order_id = %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (order_id,))
-    else:
-        cursor.execute("""
-            SELECT * FROM incident_logs
-            WHERE container_id = %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (container_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        if order_id and container_id:
+            cursor.execute("""
+                SELECT * FROM incident_logs
+                WHERE order_id = %s OR container_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (order_id, container_id))
+        elif order_id:
+            cursor.execute("""
+                SELECT * FROM incident_logs
+                WHERE order_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (order_id,))
+        else:
+            cursor.execute("""
+                SELECT * FROM incident_logs
+                WHERE container_id = %s
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (container_id,))
+        row = cursor.fetchone()
+        cursor.close()
     return row
 
 
 
+@turn_memoized("incident_logs")
 def get_all_incidents_by_order_or_container(order_id: Optional[str] = None, container_id: Optional[str] = None):
     """
     Returns a list of all incidents matching the given order_id or container_id.
     Each incident is a dict with keys: incident_id, status, order_id, container_id, etc.
     """
 
-    conn = connect_db()
-    cursor = conn.cursor(dictionary=True)
-
     query = "SELECT * FROM incident_logs WHERE 1=1"
     params = []
 
@@ -187,9 +226,11 @@ def get_all_incidents_by_order_or_container(order_id: Optional[str] = None, cont
 
     query += " ORDER BY created_at DESC"  # Or incident_id DESC
 
-    cursor.execute(query, tuple(params))
-    rows = cursor.fetchall()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+        cursor.close()
     # Convert rows to list of dicts
     incidents = [dict(row) for row in rows]
     return incidents
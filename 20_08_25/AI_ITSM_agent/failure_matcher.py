@@ -0,0 +1,161 @@
+import re
+
+# Matches MySQL LIKE semantics used by known_failures.pattern:
+#   %  -> any run of characters (including none)
+#   _  -> exactly one character
+#   \% / \_ / \\ -> literal character
+# Comparison is case-insensitive (default MySQL collation) and the pattern must match the whole payload.
+
+
+def _tokenize_like(pattern):
+    """Split a LIKE pattern into tokens: ('lit', text) / ('any', None) / ('one', None)."""
+    tokens = []
+    literal = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            literal.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in "%_":
+            if literal:
+                tokens.append(("lit", "".join(literal)))
+                literal = []
+            tokens.append(("any" if ch == "%" else "one", None))
+        else:
+            literal.append(ch)
+        i += 1
+    if literal:
+        tokens.append(("lit", "".join(literal)))
+    return tokens
+
+
+def like_to_regex(pattern):
+    parts = []
+    for kind, text in _tokenize_like(pattern):
+        if kind == "lit":
+            parts.append(re.escape(text))
+        elif kind == "any":
+            parts.append(".*")
+        else:
+            parts.append(".")
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class _AhoCorasick:
+    """Multi-keyword automaton: one pass over the text reports every keyword occurring in it."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for keyword, key_id in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (key_id,)
+
+        # Breadth-first construction of failure links; outputs are merged along them
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        # Used to jump over text that cannot start any keyword while at the root state
+        root_chars = "".join(self._goto[0].keys())
+        self._root_skip = re.compile("[" + re.escape(root_chars) + "]") if root_chars else None
+
+    def scan(self, text):
+        found = set()
+        if self._root_skip is None:
+            return found
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        i = 0
+        n = len(text)
+        while i < n:
+            if state == 0:
+                m = self._root_skip.search(text, i)
+                if m is None:
+                    break
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+            i += 1
+        return found
+
+
+class KnownFailureMatcher:
+    """
+    Compiled matcher over known_failures rows (in priority order: first row wins).
+
+    Each pattern contributes its longest literal fragment to one Aho-Corasick automaton,
+    so a payload is scanned once regardless of how many patterns exist. Only patterns whose
+    fragment was seen are verified against their full LIKE regex. Plain '%text%' patterns
+    need no verification at all.
+
+    Rows with a NULL/empty pattern describe an empty CMS response and match only a
+    missing or blank payload.
+    """
+
+    def __init__(self, rows):
+        self.rows = tuple(rows)
+        self._null_row = None
+        self._always = []          # patterns with no literal text (e.g. '%', '_%')
+        self._regex = {}
+        self._simple = set()
+        keywords = []
+
+        for idx, row in enumerate(self.rows):
+            pattern = row.get("pattern")
+            if pattern is None or not pattern.strip():
+                if self._null_row is None:
+                    self._null_row = row
+                continue
+
+            tokens = _tokenize_like(pattern)
+            literals = [text for kind, text in tokens if kind == "lit"]
+            self._regex[idx] = like_to_regex(pattern)
+
+            if len(tokens) == 3 and tokens[0][0] == "any" and tokens[1][0] == "lit" and tokens[2][0] == "any":
+                self._simple.add(idx)
+
+            if literals:
+                keywords.append((max(literals, key=len).lower(), idx))
+            else:
+                self._always.append(idx)
+
+        self._automaton = _AhoCorasick(keywords)
+
+    def match(self, response_payload):
+        if response_payload is None or not response_payload.strip():
+            return self._null_row
+
+        candidates = self._automaton.scan(response_payload.lower())
+        candidates.update(self._always)
+        for idx in sorted(candidates):
+            if idx in self._simple or self._regex[idx].fullmatch(response_payload):
+                return self.rows[idx]
+        return None
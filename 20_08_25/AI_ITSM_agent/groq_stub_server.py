@@ -0,0 +1,266 @@
+# Local stand-in for the Groq chat-completions endpoint, for load tests and offline CI.
+#
+#   python groq_stub_server.py --port 8001 --latency lognormal:400,0.6 --error-rate-429 0.05
+#   GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=stub uvicorn main:app
+#
+# Replies are canned and keyed by prompt pattern so the agent's classifiers
+# (turn analysis, intent, ID extraction JSON, confirmations, routing) behave sensibly.
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_CONFIG = {
+    "latency": "fixed:0",        # see sample_latency_ms()
+    "token_delay_ms": 15.0,      # delay between streamed chunks
+    "error_rate_429": 0.0,
+    "error_rate_5xx": 0.0,
+    "retry_after_s": 1,
+    "seed": None,
+}
+
+_ORDER = re.compile(r"\bORD[\s\-_]*\d+\b", re.IGNORECASE)
+_CONTAINER = re.compile(r"\bCONT[\s\-_]*\d+\b", re.IGNORECASE)
+_INCIDENT = re.compile(r"\bINC-\d{8}-\d{6}\b", re.IGNORECASE)
+
+
+def _quoted_message(prompt):
+    """The agent's prompts quote the user's text; fall back to the whole prompt."""
+    m = re.search(r'"([^"]*)"', prompt)
+    return m.group(1) if m else prompt
+
+
+def _canonical(match, prefix):
+    return prefix + re.sub(r"\D", "", match.group()) if match else None
+
+
+def _ids(text):
+    incident = _INCIDENT.search(text)
+    return {
+        "order_id": _canonical(_ORDER.search(text), "ORD"),
+        "container_id": _canonical(_CONTAINER.search(text), "CONT"),
+        "incident_id": incident.group().upper() if incident else None,
+    }
+
+
+def _intent(text):
+    t = text.lower()
+    if re.search(r"\b(hi|hello|hey|good (morning|afternoon|evening))\b", t):
+        return "greeting"
+    if re.search(r"\b(thanks|thank you|thx)\b", t):
+        return "thanks"
+    if re.search(r"\b(bye|that's all|end)\b", t):
+        return "end_of_convo"
+    if re.search(r"\b(new issue|another issue|new incident)\b", t):
+        return "new_issue"
+    if re.search(r"\b(status|summary|details|progress)\b", t):
+        return "summary"
+    return "normal"
+
+
+def _issue_state(text):
+    """'broken' / 'fixed' when the reply says how the issue is, else plain 'yes' / 'no' / None."""
+    t = text.lower()
+    if re.search(r"\b(still|broken|fail\w*|not working|didn't|doesn't|persists)\b", t):
+        return "broken"
+    if re.search(r"\b(worked|works|fixed|resolved|fine|all good)\b", t):
+        return "fixed"
+    if re.search(r"\b(yes|yeah|yep|yup)\b", t):
+        return "yes"
+    if re.search(r"\b(no|nope|nah)\b", t):
+        return "no"
+    return None
+
+
+# Question: "Do you still notice an issue?"  vs  "Did the workaround resolve the issue?"
+_STILL_ISSUE = {"broken": "issue_persists", "yes": "issue_persists", "fixed": "issue_resolved", "no": "issue_resolved"}
+_WORKAROUND = {"broken": "failure", "no": "failure", "fixed": "success", "yes": "success"}
+
+
+def _route(text):
+    t = text.lower()
+    for agent_type, words in (
+        ("pack_itsm", ("pack", "label", "postcode", "print", "carrier")),
+        ("location", ("location", "bin", "aisle")),
+        ("health_check", ("health", "monitor", "down")),
+        ("user_account", ("account", "login", "password", "access")),
+        ("hsn_code", ("hsn",)),
+        ("design", ("design", "workflow")),
+    ):
+        if any(w in t for w in words):
+            return agent_type
+    return "unknown"
+
+
+def _turn_analysis(prompt):
+    text = _quoted_message(prompt)
+    return json.dumps({"intent": _intent(text), **_ids(text)})
+
+
+# (pattern on the user prompt, reply builder). First match wins; --responses rules go first.
+CANNED_RULES = [
+    (r"Analyse this warehouse support chat message", _turn_analysis),
+    (r"Extract \*\*full IDs\*\*", lambda p: json.dumps(_ids(_quoted_message(p)))),
+    (r"Classify the following message into one of these intents", lambda p: _intent(_quoted_message(p))),
+    (r"issue_persists, issue_resolved, or unclear",
+     lambda p: _STILL_ISSUE.get(_issue_state(_quoted_message(p)), "unclear")),
+    (r"success, failure, or unclear",
+     lambda p: _WORKAROUND.get(_issue_state(_quoted_message(p)), "unclear")),
+    (r"pack_itsm, location, health_check", lambda p: _route(_quoted_message(p))),
+    (r"escalation email",
+     lambda p: "Dear IT Team,\n\nPlease investigate the issue below and reach out to the flow room for details.\n\nBest Regards,\nIT Support Agent"),
+    (r"workaround is", lambda p: "Gotchu, this is a known issue.\n\nPlease try the suggested workaround.\n\nLet me know if it worked so I can close the incident."),
+    (r"summary", lambda p: "Incident is In Progress.\nLatest CMS status: failure."),
+    (r".*", lambda p: "Hey! This is a stub reply from the local Groq stand-in."),
+]
+
+
+def load_rules(path):
+    """JSON list of {"match": regex, "response": text} prepended to CANNED_RULES."""
+    with open(path) as f:
+        rules = json.load(f)
+    return [(rule["match"], (lambda p, text=rule["response"]: text)) for rule in rules] + CANNED_RULES
+
+
+_rules = [(re.compile(p, re.IGNORECASE | re.DOTALL), fn) for p, fn in CANNED_RULES]
+
+
+def sample_latency_ms(spec):
+    """
+    fixed:MS | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | exponential:MEAN
+    (all in milliseconds; lognormal sigma is in log space)
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return values[0] if values else 0.0
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "normal":
+        return max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return random.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _reply_for(prompt):
+    for pattern, build in _rules:
+        if pattern.search(prompt):
+            return build(prompt)
+    return ""
+
+
+def _usage(messages, reply):
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    completion_tokens = max(1, len(reply) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+app = FastAPI()
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    model = body.get("model", "stub-model")
+
+    await asyncio.sleep(sample_latency_ms(STUB_CONFIG["latency"]) / 1000)
+
+    roll = random.random()
+    if roll < STUB_CONFIG["error_rate_429"]:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": str(STUB_CONFIG["retry_after_s"])},
+        )
+    if roll < STUB_CONFIG["error_rate_429"] + STUB_CONFIG["error_rate_5xx"]:
+        status = random.choice([500, 502, 503])
+        return JSONResponse({"error": {"message": "Upstream failure (stub)", "type": "server_error"}}, status_code=status)
+
+    reply = _reply_for(prompt)
+    max_tokens = body.get("max_tokens")
+    if max_tokens:
+        reply = reply[: max_tokens * 4]
+    for stop in body.get("stop") or []:
+        if stop and stop in reply:
+            reply = reply[: reply.index(stop)]
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    usage = _usage(messages, reply)
+
+    if body.get("stream"):
+        async def events():
+            pieces = re.findall(r"\S+\s*|\s+", reply) or [""]
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(STUB_CONFIG["token_delay_ms"] / 1000)
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece} if i == 0 else {"content": piece},
+                                 "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Groq-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default=STUB_CONFIG["latency"],
+                        help="fixed:MS | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MEDIAN,SIGMA | exponential:MEAN")
+    parser.add_argument("--token-delay-ms", type=float, default=STUB_CONFIG["token_delay_ms"])
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=STUB_CONFIG["retry_after_s"])
+    parser.add_argument("--responses", help="JSON file with extra {match, response} rules")
+    parser.add_argument("--seed", type=int, help="seed for repeatable latency/error sampling")
+    args = parser.parse_args()
+
+    sample_latency_ms(args.latency)  # validate the spec early
+    STUB_CONFIG.update({
+        "latency": args.latency,
+        "token_delay_ms": args.token_delay_ms,
+        "error_rate_429": args.error_rate_429,
+        "error_rate_5xx": args.error_rate_5xx,
+        "retry_after_s": args.retry_after,
+        "seed": args.seed,
+    })
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.responses:
+        _rules = [(re.compile(p, re.IGNORECASE | re.DOTALL), fn) for p, fn in load_rules(args.responses)]
+
+    uvicorn.run(app, host=args.host, port=args.port)
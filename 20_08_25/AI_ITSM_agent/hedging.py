@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.9))      # hedge after this latency quantile...
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", 300))  # ...but never sooner than this
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))  # no hedging until the quantile means something
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", 0.1))          # max extra requests, as a share of hedgeable calls
+
+
+class HedgeBudget:
+    """Allows a hedge only while hedges sent stay within `ratio` of the hedgeable calls seen."""
+
+    def __init__(self, ratio=LLM_HEDGE_BUDGET):
+        self.ratio = ratio
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "over_budget": 0}
+
+    def count_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+
+    def try_spend(self):
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.ratio * self.stats["calls"]:
+                self.stats["over_budget"] += 1
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def count_win(self):
+        with self._lock:
+            self.stats["hedge_wins"] += 1
+
+
+def hedge_delay_s(p_latency_ms, samples):
+    """Seconds to wait before hedging, or None while there's too little history."""
+    if p_latency_ms is None or samples < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_MS, p_latency_ms) / 1000
+
+
+async def _cancel(task):
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def run_hedged(call, delay_s, budget):
+    """
+    Runs `call()` (a coroutine factory). If it hasn't finished after `delay_s` and the
+    budget allows, starts an identical second call; the first successful result wins
+    and the other is cancelled. Returns (result, hedged, hedge_won).
+    """
+    primary = asyncio.ensure_future(call())
+    if delay_s is None:
+        return await primary, False, False
+
+    done, _ = await asyncio.wait({primary}, timeout=delay_s)
+    if done or not budget.try_spend():
+        return await primary, False, False
+
+    hedge = asyncio.ensure_future(call())
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    won = task is hedge
+                    if won:
+                        budget.count_win()
+                    return task.result(), True, won
+        # Both failed: surface the primary's error
+        return primary.result(), True, False
+    finally:
+        for task in (primary, hedge):
+            if not task.done():
+                await _cancel(task)
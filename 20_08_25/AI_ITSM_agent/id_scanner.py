@@ -0,0 +1,104 @@
+import re
+from typing import Dict, Optional, Tuple
+
+# Deterministic ID scanner run before any LLM extraction.
+# Accepts the spellings seen in the flow room, e.g.:
+#   ORD69021, ord-69021, "ord 69021", "order 69021"
+#   CONT1234, cont_1234, "cont 1234", "container 1234"
+#   INC-20250819-001143, inc 20250819 001143
+# IDs are returned in canonical form (ORD69021 / CONT1234 / INC-20250819-001143).
+
+_SEP = r"[\s\-_#:]*"
+
+_ID_PATTERNS = {
+    "order_id": (
+        re.compile(r"\bORD-?(\d+)\b", re.IGNORECASE),
+        re.compile(r"\bORD(?:ER)?" + _SEP + r"(\d{3,})\b", re.IGNORECASE),
+        "ORD{}",
+    ),
+    "container_id": (
+        re.compile(r"\bCONT-?(\d+)\b", re.IGNORECASE),
+        re.compile(r"\bCONT(?:AINER)?" + _SEP + r"(\d{3,})\b", re.IGNORECASE),
+        "CONT{}",
+    ),
+}
+
+_INCIDENT_STRICT = re.compile(r"\bINC-(\d{8})-(\d{6})\b", re.IGNORECASE)
+_INCIDENT_LOOSE = re.compile(r"\bINC(?:IDENT)?" + _SEP + r"(\d{8})" + _SEP + r"(\d{6})\b", re.IGNORECASE)
+
+_DIGIT_RUN = re.compile(r"\d{3,}")
+
+CONFIDENT = 1.0        # exact spelling, one value per ID type
+LOOSE = 0.9            # spaced / worded spelling ("cont 1234")
+AMBIGUOUS = 0.4        # several values for one ID type, or stray numbers left over
+NOTHING_FOUND = 0.0    # digits present but no recognisable ID
+
+
+def _collect(text, strict, loose, template):
+    values, spans, loose_used = [], [], False
+    for pattern, is_loose in ((strict, False), (loose, True)):
+        for m in pattern.finditer(text):
+            if any(s <= m.start() < e for s, e in spans):
+                continue
+            value = template(m)
+            spans.append(m.span())
+            if value not in values:
+                values.append(value)
+                loose_used = loose_used or is_loose
+    return values, spans, loose_used
+
+
+def scan_ids(message: str) -> Tuple[Dict[str, Optional[str]], float]:
+    """
+    Returns ({"order_id", "container_id", "incident_id"}, confidence).
+    Confidence is 1.0 when the message has no digits at all (nothing to extract).
+    """
+    text = message or ""
+    ids = {"order_id": None, "container_id": None, "incident_id": None}
+    confidence = CONFIDENT
+    all_spans = []
+    found_any = False
+
+    incidents, spans, loose_used = _collect(
+        text, _INCIDENT_STRICT, _INCIDENT_LOOSE, lambda m: f"INC-{m.group(1)}-{m.group(2)}"
+    )
+    all_spans += spans
+    if incidents:
+        found_any = True
+        ids["incident_id"] = incidents[0]
+        if len(incidents) > 1:
+            confidence = min(confidence, AMBIGUOUS)
+        elif loose_used:
+            confidence = min(confidence, LOOSE)
+
+    for key, (strict, loose, fmt) in _ID_PATTERNS.items():
+        values, spans, loose_used = _collect(text, strict, loose, lambda m, fmt=fmt: fmt.format(m.group(1)))
+        all_spans += spans
+        if not values:
+            continue
+        found_any = True
+        ids[key] = values[0]
+        if len(values) > 1:
+            confidence = min(confidence, AMBIGUOUS)
+        elif loose_used:
+            confidence = min(confidence, LOOSE)
+
+    # Numbers that aren't part of any recognised ID could be IDs typed without a prefix
+    stray_digits = any(
+        not any(s <= m.start() < e for s, e in all_spans)
+        for m in _DIGIT_RUN.finditer(text)
+    )
+    if stray_digits:
+        confidence = min(confidence, AMBIGUOUS if found_any else NOTHING_FOUND)
+
+    return ids, confidence
+
+
+def is_ids_only(message: str) -> bool:
+    """True when the message contains nothing but IDs (plus separators/punctuation)."""
+    residual = message or ""
+    for strict, loose, _ in _ID_PATTERNS.values():
+        residual = loose.sub(" ", strict.sub(" ", residual))
+    residual = _INCIDENT_LOOSE.sub(" ", _INCIDENT_STRICT.sub(" ", residual))
+    residual = re.sub(r"\band\b", " ", residual, flags=re.IGNORECASE)
+    return re.fullmatch(r"[\W_]*", residual) is not None
@@ -1,24 +1,27 @@
-from typing import Dict, Tuple, Optional, Any
+import asyncio
+from typing import Tuple, Optional
 
+import reply_stream
+from async_utils import run_sync
 from llm_interface import (
-    ask_llm,
-    extract_ids,
-    request_missing_id,
-    phrase_workaround,
-    draft_email_content,
-    interpret_user_confirmation,
-    detect_intent,
-    handle_greeting,
-    handle_thanks,
-    user_confirmation,
-    request_missing_summary_ids,
-    draft_summary_message,
-    phrase_mismatch_or_notfound
+    analyze_turn_async,
+    extract_ids_async,
+    request_missing_id_async,
+    phrase_workaround_async,
+    draft_email_content_async,
+    interpret_user_confirmation_async,
+    handle_greeting_async,
+    handle_thanks_async,
+    user_confirmation_async,
+    request_missing_summary_ids_async,
+    draft_summary_message_async,
+    phrase_mismatch_or_notfound_async
 )
 
 from db_interface import (
     get_latest_log,
     find_known_failure_match,
+    get_precomputed_phrasing,
     log_incident,
     update_incident_status,
     get_incident_by_id,
@@ -29,32 +32,71 @@ from db_interface import (
 )
 
 from email_utils import send_email_to_it
+from conversation_state import (
+    IDLE,
+    AWAITING_WORKAROUND_CONFIRMATION,
+    AWAITING_SUCCESS_CONFIRMATION,
+    AWAITING_INCIDENT_CHOICE,
+    current_state,
+    transition,
+)
+from id_scanner import scan_ids
+from session_record import SessionState
+from turn_dag import TurnDAG
+
+
+# --- Turn stages (see turn_dag.py). Same lookups, started as soon as their inputs are known. ---
+
+def _latest_log(dag, order_id, container_id, speculative=False):
+    return dag.run("latest_log", get_latest_log, order_id=order_id, container_id=container_id,
+                   blocking=True, speculative=speculative)
+
+
+async def _match_latest_log(dag, order_id, container_id):
+    latest_log = await _latest_log(dag, order_id, container_id)
+    if not latest_log:
+        return None
+    return await asyncio.to_thread(find_known_failure_match, latest_log.get("response_xml", ""))
+
+
+def _failure_match(dag, order_id, container_id, speculative=False):
+    return dag.run("failure_match", _match_latest_log, dag, order_id, container_id, speculative=speculative)
+
 
+def _predicted_ids(user_input, session_state):
+    """IDs the turn will most likely look up: scanned from the message, else the session's."""
+    scanned, _ = scan_ids(user_input)
+    return (scanned["order_id"] or session_state.order_id,
+            scanned["container_id"] or session_state.container_id)
 
-def _handle_summary_request(session_state: Dict[str, Any],
-                            incident_id: Optional[str],
-                            order_id: Optional[str],
-                            container_id: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+
+async def _handle_summary_request(session_state: SessionState,
+                                  incident_id: Optional[str],
+                                  order_id: Optional[str],
+                                  container_id: Optional[str],
+                                  dag: TurnDAG) -> Tuple[str, SessionState]:
     """
     Handles a user's request for an incident summary.
     Fully stateless: ignores any session pending incidents or statuses.
     Fetches incident by provided IDs or asks for missing ones.
     Handles multiple incidents by asking user to pick one.
+    Lookups on the provided order/container IDs run concurrently; they are
+    checked in the same order as before.
     """
 
     explicit_id_provided = bool(incident_id or order_id or container_id)
 
     if not explicit_id_provided:
-        msg = request_missing_summary_ids()
+        msg = await request_missing_summary_ids_async()
         return msg, session_state
 
     incident_row = None
 
     # Incident ID provided
     if incident_id:
-        incident_row = get_incident_by_id(incident_id)
+        incident_row = await dag.run("get_incident", get_incident_by_id, incident_id, blocking=True)
         if not incident_row:
-            msg = phrase_mismatch_or_notfound({"type": "notfound", "incident_id": incident_id})
+            msg = await phrase_mismatch_or_notfound_async({"type": "notfound", "incident_id": incident_id})
             return msg, session_state
 
         # Check mismatches if order/container IDs are provided
@@ -68,7 +110,7 @@ def _handle_summary_request(session_state: Dict[str, Any],
                 f"Container ID mismatch: incident {incident_id} has {incident_row['container_id']} but you gave {container_id}"
             )
         if mismatches:
-            msg = phrase_mismatch_or_notfound({"type": "mismatch", "incident_id": incident_id, "details": mismatches})
+            msg = await phrase_mismatch_or_notfound_async({"type": "mismatch", "incident_id": incident_id, "details": mismatches})
             return msg, session_state
 
         order_id = incident_row.get("order_id")
@@ -76,16 +118,27 @@ def _handle_summary_request(session_state: Dict[str, Any],
 
     # Only order/container provided
     else:
-        if order_id and not order_exists(order_id):
-            msg = phrase_mismatch_or_notfound({"type": "notfound", "provided_order_id": order_id})
+        # Existence checks, incident list and CMS lookups all key on the provided IDs:
+        # start them together, then use them in the original order
+        if order_id:
+            dag.run("order_exists", order_exists, order_id, blocking=True, speculative=True)
+        if container_id:
+            dag.run("container_exists", container_exists, container_id, blocking=True, speculative=True)
+        dag.run("incidents", get_all_incidents_by_order_or_container, order_id, container_id,
+                blocking=True, speculative=True)
+        _failure_match(dag, order_id, container_id, speculative=True)
+
+        if order_id and not await dag.run("order_exists", order_exists, order_id, blocking=True):
+            msg = await phrase_mismatch_or_notfound_async({"type": "notfound", "provided_order_id": order_id})
             return msg, session_state
-        if container_id and not container_exists(container_id):
-            msg = phrase_mismatch_or_notfound({"type": "notfound", "provided_container_id": container_id})
+        if container_id and not await dag.run("container_exists", container_exists, container_id, blocking=True):
+            msg = await phrase_mismatch_or_notfound_async({"type": "notfound", "provided_container_id": container_id})
             return msg, session_state
 
-        all_incidents = get_all_incidents_by_order_or_container(order_id, container_id)
+        all_incidents = await dag.run("incidents", get_all_incidents_by_order_or_container, order_id, container_id,
+                                      blocking=True)
         if not all_incidents:
-            msg = phrase_mismatch_or_notfound({
+            msg = await phrase_mismatch_or_notfound_async({
                 "type": "notfound",
                 "provided_order_id": order_id,
                 "provided_container_id": container_id
@@ -102,20 +155,19 @@ def _handle_summary_request(session_state: Dict[str, Any],
                 f"{choices}\n\n"
                 f"Could you please specify which incident ID you'd like details for?"
             )
-            session_state["pending_incident_choice_for_summary"] = [row["incident_id"] for row in all_incidents]
+            session_state.incident_choices = [row["incident_id"] for row in all_incidents]
+            transition(session_state, "multiple_incidents")
             return msg, session_state
 
         incident_row = all_incidents[0]
         incident_id = incident_row["incident_id"]
 
     # --- NEW PART: enrich with cms + failure ---
-    cms_log = get_latest_log(order_id=order_id, container_id=container_id)
     issue_summary, workaround = None, None
-    if cms_log:
-        failure = find_known_failure_match(cms_log["response_xml"])
-        if failure:
-            issue_summary = failure["failure_type"]
-            workaround = failure["workaround"]    
+    failure = await _failure_match(dag, order_id, container_id)
+    if failure:
+        issue_summary = failure["failure_type"]
+        workaround = failure["workaround"]
 
     facts = {
         "incident_id": incident_id,
@@ -127,170 +179,249 @@ def _handle_summary_request(session_state: Dict[str, Any],
         "workaround": workaround
     }
 
-    session_state["last_summary_incident_id"] = incident_id
-    summary_msg = draft_summary_message(facts)
+    session_state.last_summary_incident_id = incident_id
+    summary_msg = await draft_summary_message_async(facts)
     return summary_msg, session_state
 
 
-def handle_user_message(user_input, session_state):
+async def handle_turn_async(user_input, session_state):
+    """Entry point for one chat turn: the conversation state decides which handler (and classifiers) run."""
     if session_state is None:
-        session_state = {"incident_id": None, "order_id": None, "container_id": None, "status": None}
+        session_state = SessionState()
+    handler = STATE_HANDLERS[current_state(session_state)]
+    return await handler(user_input, session_state)
+
+
+async def handle_user_message_async(user_input, session_state):
+    """
+    A turn in the idle state (nothing pending), as a small stage graph (turn_dag.py):
 
-    session_state["last_user_message"] = user_input
-    extracted = extract_ids(user_input)
-    incident_id = extracted.get("incident_id")
-    order_id = extracted.get("order_id")
-    container_id = extracted.get("container_id")
+        analyze_turn ──────────────┐
+        latest_log ─> failure_match┴─> branch logic ─> log_incident ─> mark_in_progress ─> ...
+
+    The CMS log and known-failure match for the IDs the turn will most likely use
+    (scanned from the message, else the session's) are looked up while the LLM
+    analyses the message; they are only used if the analysis lands on the same IDs.
+    """
+    if session_state is None:
+        session_state = SessionState()
+
+    dag = TurnDAG("user_message")
+    try:
+        return await _handle_user_message(user_input, session_state, dag)
+    finally:
+        await dag.close()
+
+
+async def _handle_user_message(user_input, session_state, dag):
+    session_state.last_user_message = user_input
+    # One LLM round trip for intent + IDs
+    analysis_stage = dag.run("analyze_turn", analyze_turn_async, user_input)
+    predicted_order_id, predicted_container_id = _predicted_ids(user_input, session_state)
+    if predicted_order_id or predicted_container_id:
+        _failure_match(dag, predicted_order_id, predicted_container_id, speculative=True)
+    analysis = await analysis_stage
+    incident_id = analysis.get("incident_id")
+    order_id = analysis.get("order_id")
+    container_id = analysis.get("container_id")
 
     # Update session IDs if present
     if incident_id:
-        session_state["incident_id"] = incident_id
+        session_state.incident_id = incident_id
     if order_id:
-        session_state["order_id"] = order_id
+        session_state.order_id = order_id
     if container_id:
-        session_state["container_id"] = container_id
-
-    # --- NEW: Check if message is only IDs ---
-    only_ids_provided = all([
-        user_input.strip().lower() in 
-        [str(incident_id or "").lower(), str(order_id or "").lower(), str(container_id or "").lower()]
-    ])
+        session_state.container_id = container_id
 
     # If only IDs provided, skip detection and continue with last intent
-    if not only_ids_provided:
-        intent = detect_intent(user_input)
+    if not analysis.get("ids_only"):
+        intent = analysis.get("intent")
         print(f"[DEBUG] Detected intent: {intent}")
         if intent:
-            session_state["last_intent"] = intent
+            session_state.last_intent = intent
     else:
         # Carry forward the previous intent
-        intent = session_state.get("last_intent")
+        intent = session_state.last_intent
         print(f"[DEBUG] Continuing with last intent: {intent}")
 
 
     # --- Greeting / Thanks ---
-    if intent == "greeting" and not session_state.get("incident_id"):
-        return handle_greeting(), session_state
+    if intent == "greeting" and not session_state.incident_id:
+        return await handle_greeting_async(), session_state
     if intent in ["thanks", "end_of_convo"]:
-        return handle_thanks(), session_state
+        return await handle_thanks_async(), session_state
 
     # --- Handle summary flow ---
-    if session_state.get("pending_incident_choice_for_summary"):
-        if incident_id and incident_id in session_state["pending_incident_choice_for_summary"]:
-            session_state.pop("pending_incident_choice_for_summary", None)
-            summary_msg, session_state = _handle_summary_request(
-                session_state, incident_id, None, None
-            )
-            return summary_msg, session_state
-        else:
-            return f"Please reply with one of the valid incident IDs: {', '.join(session_state['pending_incident_choice_for_summary'])}", session_state
-
     if intent == "summary":
-        summary_msg, session_state = _handle_summary_request(
+        summary_msg, session_state = await _handle_summary_request(
             session_state,
             incident_id,
             order_id,
-            container_id
+            container_id,
+            dag
         )
         return summary_msg, session_state
 
     # --- New issue flow ---
-    issue_resolved_or_escalated = session_state.get("status") in ["Resolved", "EscalatedToIT", "Open"]
+    issue_resolved_or_escalated = session_state.status in ["Resolved", "EscalatedToIT", "Open"]
     if intent == "new_issue" and issue_resolved_or_escalated:
-        session_state.clear()
-        session_state = {"incident_id": None, "order_id": None, "container_id": None, "status": None}
-        extracted = extract_ids(user_input)
-        order_id = extracted.get("order_id")
-        container_id = extracted.get("container_id")
+        session_state = SessionState()
         if not order_id and not container_id:
             return "Sure, let’s take a look at your new issue. Could you please share the Order ID or Container ID?", session_state
-        session_state["order_id"] = order_id
-        session_state["container_id"] = container_id
+        session_state.order_id = order_id
+        session_state.container_id = container_id
 
     # Ensure IDs are set
-    order_id = session_state.get("order_id")
-    container_id = session_state.get("container_id")
+    order_id = session_state.order_id
+    container_id = session_state.container_id
     if not order_id and not container_id:
-        prompt = request_missing_id(order_id, container_id)
+        prompt = await request_missing_id_async(order_id, container_id)
         return prompt, session_state
 
     # Check latest log
-    latest_log = get_latest_log(order_id=order_id, container_id=container_id)
+    latest_log = await _latest_log(dag, order_id, container_id)
     if not latest_log:
         return f"I couldn't find any recent activity for the given {'order ID' if order_id else 'container ID'}. Could you double-check the ID and try again?", session_state
 
     # Log incident if new
-    if not session_state.get("incident_id"):
+    if not session_state.incident_id:
         summary = f"Issue with Order {order_id}" if order_id else f"Issue with Container {container_id}"
-        incident_id = log_incident(order_id, container_id, summary)
-        session_state["incident_id"] = incident_id
-        session_state["status"] = "In Progress"
+        incident_id = await dag.run("log_incident", log_incident, order_id, container_id, summary, blocking=True)
+        session_state.incident_id = incident_id
+        session_state.status = "In Progress"
 
-    update_incident_status(session_state["incident_id"], "In Progress")
+    # Nothing below reads this write: let it overlap the rest of the turn
+    dag.run("mark_in_progress", update_incident_status, session_state.incident_id, "In Progress", blocking=True)
 
-    # Handle success confirmation
+    # CMS says success: ask whether the user still sees the issue
     log_status = latest_log.get("status", "").lower()
-    if log_status == "success" and not session_state.get("awaiting_success_confirmation"):
-        session_state["awaiting_success_confirmation"] = True
+    if log_status == "success":
+        transition(session_state, "success_log_found")
         return f"I checked the CMS logs for {order_id or container_id}, and everything looks fine on our side. Do you still notice an issue with your order?", session_state
 
-    if session_state.get("awaiting_success_confirmation"):
-        incident_id = session_state.get("incident_id")
-        confirmation = user_confirmation(user_input)
-        if confirmation == "issue_persists":
-            if not incident_id:
-                incident_id = log_incident(order_id, container_id, "User confirmed issue despite success status")
-                session_state["incident_id"] = incident_id
-            update_incident_status(incident_id, "Open")
-            subject = f"Escalation Request: Issue despite success response {order_id or container_id}"
-            summary = f"The incident with order/container ({order_id or container_id}) has successful response from CMS, but the user still faces issue.\n\nIncident ID: {incident_id}\nPlease investigate potential underlying issues."
-            email_body = draft_email_content(summary)
-            send_email_to_it(subject, body=email_body)
-            session_state["awaiting_success_confirmation"] = False
-            session_state["status"] = "EscalatedToIT"
-            return "I've escalated this to IT and sent them an email.\n\n" + email_body, session_state
-        elif confirmation == "issue_resolved":
-            session_state["awaiting_success_confirmation"] = False
-            update_incident_status(incident_id, "Closed")
-            session_state["status"] = "Resolved"
-            return "Okay, I will close this incident.", session_state
-        else:
-            return "Please confirm if you still see an issue with the order. Reply with yes or no.", session_state
-
     # Known failure handling
-    response_payload = latest_log.get("response_xml", "")
-    match = find_known_failure_match(response_payload)
+    match = await _failure_match(dag, order_id, container_id)
     if match:
         issue_type = match.get("failure_type")
-        phrased_response = phrase_workaround(match["workaround"], issue_type)
-        session_state["awaiting_user_confirmation"] = True
+        # Served from the precomputed variants when available; live LLM phrasing otherwise
+        phrased_response = get_precomputed_phrasing(match) or await phrase_workaround_async(match["workaround"], issue_type)
+        transition(session_state, "workaround_suggested")
         return phrased_response, session_state
 
     # Unknown failure
     summary = f"Issue reported for Order {order_id or ''} / Container {container_id or ''}. No known pattern matched."
-    email_body = draft_email_content(summary)
-    session_state["status"] = "EscalatedToIT"
-    return "I'm unable to resolve this with known workarounds. I've escalated the issue to our IT team. They’ll look into it shortly.\n\n" + email_body, session_state
-
-
-def handle_user_confirmation(user_input, session_state):
-    result = interpret_user_confirmation(user_input)
+    intro = "I'm unable to resolve this with known workarounds. I've escalated the issue to our IT team. They’ll look into it shortly.\n\n"
+    reply_stream.emit(intro)
+    email_body = await draft_email_content_async(summary)
+    session_state.status = "EscalatedToIT"
+    return intro + email_body, session_state
+
+
+async def handle_success_confirmation_async(user_input, session_state):
+    """Reply to "Do you still notice an issue?" after CMS reported success: only yes/no matters."""
+    session_state.last_user_message = user_input
+    order_id = session_state.order_id
+    container_id = session_state.container_id
+    incident_id = session_state.incident_id
+
+    confirmation = await user_confirmation_async(user_input)
+    if confirmation == "issue_persists":
+        if not incident_id:
+            incident_id = await asyncio.to_thread(log_incident, order_id, container_id, "User confirmed issue despite success status")
+            session_state.incident_id = incident_id
+        await asyncio.to_thread(update_incident_status, incident_id, "Open")
+        subject = f"Escalation Request: Issue despite success response {order_id or container_id}"
+        summary = f"The incident with order/container ({order_id or container_id}) has successful response from CMS, but the user still faces issue.\n\nIncident ID: {incident_id}\nPlease investigate potential underlying issues."
+        intro = "I've escalated this to IT and sent them an email.\n\n"
+        reply_stream.emit(intro)
+        email_body = await draft_email_content_async(summary)
+        await asyncio.to_thread(send_email_to_it, subject, body=email_body)
+        session_state.status = "EscalatedToIT"
+        transition(session_state, "issue_persists")
+        return intro + email_body, session_state
+    elif confirmation == "issue_resolved":
+        await asyncio.to_thread(update_incident_status, incident_id, "Closed")
+        session_state.status = "Resolved"
+        transition(session_state, "issue_resolved")
+        return "Okay, I will close this incident.", session_state
+    else:
+        transition(session_state, "unclear")
+        return "Please confirm if you still see an issue with the order. Reply with yes or no.", session_state
+
+
+async def handle_incident_choice_async(user_input, session_state):
+    """Reply to "which incident?" after a summary matched several: only an incident ID matters."""
+    session_state.last_user_message = user_input
+    # Regex scanner first; the LLM is only asked when the scan is unsure
+    ids = await extract_ids_async(user_input)
+    for key in ("incident_id", "order_id", "container_id"):
+        if ids.get(key):
+            setattr(session_state, key, ids[key])
+
+    incident_id = ids.get("incident_id")
+    choices = session_state.incident_choices or []
+    if not incident_id or incident_id not in choices:
+        transition(session_state, "invalid_choice")
+        return f"Please reply with one of the valid incident IDs: {', '.join(choices)}", session_state
+
+    session_state.incident_choices = None
+    transition(session_state, "incident_chosen")
+    dag = TurnDAG("incident_choice")
+    try:
+        return await _handle_summary_request(session_state, incident_id, None, None, dag)
+    finally:
+        await dag.close()
+
+
+async def handle_user_confirmation_async(user_input, session_state):
+    """Reply to "did the workaround resolve the issue?"."""
+    result = await interpret_user_confirmation_async(user_input)
 
     if result == "success":
-        update_incident_status(session_state["incident_id"], "Resolved")
-        session_state["status"] = "Resolved"
-        session_state["awaiting_user_confirmation"] = False
+        await asyncio.to_thread(update_incident_status, session_state.incident_id, "Resolved")
+        session_state.status = "Resolved"
+        transition(session_state, "workaround_worked")
         return "Great! I'm glad that resolved your issue. Let me know if you need help with anything else.", session_state
 
     elif result == "failure":
-        update_incident_status(session_state["incident_id"], "Open")
-        subject = f"Escalation Request: Workaround failed for {session_state['order_id'] or session_state['container_id']}"
-        summary = f"User confirmed workaround failed for Order / Container - {session_state['order_id'] or session_state['container_id']}. Incident ID: {session_state['incident_id']}"
-        email_body = draft_email_content(summary)
-        send_email_to_it(subject, body=email_body)
-        session_state["status"] = "EscalatedToIT"
-        session_state["awaiting_user_confirmation"] = False
-        return "Thanks for confirming. I've escalated this to our IT team for further investigation.\n\n" + email_body, session_state
+        await asyncio.to_thread(update_incident_status, session_state.incident_id, "Open")
+        subject = f"Escalation Request: Workaround failed for {session_state.order_id or session_state.container_id}"
+        summary = f"User confirmed workaround failed for Order / Container - {session_state.order_id or session_state.container_id}. Incident ID: {session_state.incident_id}"
+        intro = "Thanks for confirming. I've escalated this to our IT team for further investigation.\n\n"
+        reply_stream.emit(intro)
+        email_body = await draft_email_content_async(summary)
+        await asyncio.to_thread(send_email_to_it, subject, body=email_body)
+        session_state.status = "EscalatedToIT"
+        transition(session_state, "workaround_failed")
+        return intro + email_body, session_state
 
     else:
+        transition(session_state, "unclear")
         return "Just to confirm, did the workaround resolve the issue? Please reply with yes or no.", session_state
+
+
+# Which handler serves a reply in each conversation state, and the classifiers it runs:
+#   idle                              analyze_turn (intent + IDs, one fused call)
+#   awaiting_workaround_confirmation  interpret_user_confirmation (confirmation_rules, else one call)
+#   awaiting_success_confirmation     user_confirmation (confirmation_rules, else one call)
+#   awaiting_incident_choice          extract_ids (regex scan; LLM only if the scan is unsure)
+STATE_HANDLERS = {
+    IDLE: handle_user_message_async,
+    AWAITING_WORKAROUND_CONFIRMATION: handle_user_confirmation_async,
+    AWAITING_SUCCESS_CONFIRMATION: handle_success_confirmation_async,
+    AWAITING_INCIDENT_CHOICE: handle_incident_choice_async,
+}
+
+
+# --- Blocking wrappers (CLI / scripts). The API uses the *_async variants. ---
+
+def handle_turn(user_input, session_state):
+    return run_sync(handle_turn_async(user_input, session_state))
+
+
+def handle_user_message(user_input, session_state):
+    return run_sync(handle_user_message_async(user_input, session_state))
+
+
+def handle_user_confirmation(user_input, session_state):
+    return run_sync(handle_user_confirmation_async(user_input, session_state))
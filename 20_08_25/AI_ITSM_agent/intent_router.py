@@ -0,0 +1,169 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from llm_interface import ISSUE_AGENT_TYPES, classify_issue_intent_async
+
+# Front-door router for /classify_intent.
+#
+# 1. Normalised-message cache: "Label not printing for ORD123!" and
+#    "label not printing for ord 456" share one entry.
+# 2. Phrase index built from the agent-type descriptions (ISSUE_AGENT_TYPES) plus the
+#    phrases below. The message is matched longest phrase first; each match votes for
+#    its agent type(s) with its number of words (description words count half, they
+#    are vaguer). The router answers when one type clearly leads.
+# 3. Otherwise classify_issue_intent (local model, then the LLM), and the answer is cached.
+
+INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv("INTENT_ROUTER_MIN_CONFIDENCE", 0.75))
+INTENT_ROUTER_CACHE_SIZE = int(os.getenv("INTENT_ROUTER_CACHE_SIZE", 2048))
+INTENT_ROUTER_CACHE_TTL_S = float(os.getenv("INTENT_ROUTER_CACHE_TTL_S", 3600))
+
+# Wording seen at the front door that the one-line descriptions don't cover
+AGENT_PHRASES = {
+    "pack_itsm": ["pack", "packing", "pack station", "packed", "label", "shipping label", "print", "printing",
+                  "printer", "reprint", "postcode", "post code", "zip code", "pincode", "carrier", "hazmat",
+                  "parcel", "box", "consignment", "manifest", "flow room"],
+    "location": ["bin", "aisle", "slot", "shelf", "rack", "putaway", "put away", "wrong location",
+                 "location not found", "stock location", "zone"],
+    "health_check": ["health check", "monitoring", "monitor", "system down", "outage", "server", "uptime",
+                     "slow", "latency", "dashboard", "alert", "heartbeat", "not responding"],
+    "user_account": ["account", "login", "log in", "sign in", "password", "reset password", "locked out",
+                     "permission", "permissions", "access", "new user", "create user", "username", "role"],
+    "hsn_code": ["hsn", "hsn code", "tariff", "commodity code", "customs code", "gst"],
+    # Not a bare "flow": "the flow room" is where packing happens
+    "design": ["workflow", "design", "process flow", "flow diagram", "diagram", "how does", "architecture"],
+}
+
+_STOPWORDS = {"only", "or", "and", "related", "issue", "queries", "query", "a", "an", "the", "of", "to",
+              "for", "with", "is", "it", "my", "i", "in", "on", "not", "check", "system", "creation", "code"}
+_DESCRIPTION_WEIGHT = 0.5
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def normalise(message):
+    """Lower-case words without digits ("ORD123" and "ord 456" both become "ord")."""
+    words = (re.sub(r"\d+", "", _stem(w)) for w in _WORD.findall((message or "").lower()))
+    return " ".join(w for w in words if w)
+
+
+def build_index(agent_types=ISSUE_AGENT_TYPES, phrases=AGENT_PHRASES):
+    """{phrase words tuple: {agent_type: weight}} from the descriptions' content words and the extra phrases."""
+    index = defaultdict(dict)
+    for agent_type, description in agent_types.items():
+        for word in normalise(description.replace("-", " ")).split():
+            if word not in _STOPWORDS:
+                index[(word,)][agent_type] = _DESCRIPTION_WEIGHT
+    for agent_type, agent_phrases in phrases.items():
+        for phrase in agent_phrases:
+            words = tuple(normalise(phrase).split())
+            index[words][agent_type] = float(len(words))
+    return dict(index)
+
+
+class IntentRouter:
+    def __init__(self, classify=classify_issue_intent_async, index=None, min_confidence=INTENT_ROUTER_MIN_CONFIDENCE,
+                 cache_size=INTENT_ROUTER_CACHE_SIZE, cache_ttl=INTENT_ROUTER_CACHE_TTL_S):
+        self.classify = classify
+        self.index = index if index is not None else build_index()
+        self.max_phrase_words = max(len(phrase) for phrase in self.index)
+        self.min_confidence = min_confidence
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()   # normalised message -> (agent_type, stored_at)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "cache_hits": 0, "index_hits": 0, "deferred": 0}
+
+    def score(self, key):
+        """{agent_type: score} for a normalised message."""
+        words = key.split()
+        scores = defaultdict(float)
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_phrase_words, len(words) - i), 0, -1):
+                weights = self.index.get(tuple(words[i:i + n]))
+                if weights:
+                    for agent_type, weight in weights.items():
+                        scores[agent_type] += weight / len(weights)
+                    i += n
+                    break
+            else:
+                i += 1
+        return scores
+
+    def route_locally(self, key):
+        """(agent_type, confidence) from the phrase index; agent_type None when nothing matched."""
+        ranked = sorted(self.score(key).items(), key=lambda item: item[1], reverse=True)
+        if not ranked:
+            return None, 0.0
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best, best_score / (best_score + runner_up)
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            agent_type, stored_at = entry
+            if time.monotonic() - stored_at > self.cache_ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return agent_type
+
+    def _store(self, key, agent_type):
+        with self._lock:
+            self._cache[key] = (agent_type, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _route_key(self, key, message):
+        agent_type = self._cached(key)
+        if agent_type is not None:
+            self.stats["cache_hits"] += 1
+            return agent_type
+        agent_type, confidence = self.route_locally(key)
+        if agent_type is not None and confidence >= self.min_confidence:
+            self.stats["index_hits"] += 1
+        else:
+            self.stats["deferred"] += 1  # local model / LLM
+            agent_type = await self.classify(message)
+        self._store(key, agent_type)
+        return agent_type
+
+    async def route(self, message):
+        self.stats["calls"] += 1
+        return await self._route_key(normalise(message), message)
+
+    async def route_many(self, messages):
+        """Agent types for `messages` in order; each distinct normalised message is routed once."""
+        self.stats["calls"] += len(messages)
+        keys = [normalise(message) for message in messages]
+        firsts = {}
+        for key, message in zip(keys, messages):
+            firsts.setdefault(key, message)
+        routed = await asyncio.gather(*(self._route_key(key, message) for key, message in firsts.items()))
+        by_key = dict(zip(firsts, routed))
+        self.stats["cache_hits"] += len(messages) - len(firsts)  # repeats within the batch
+        return [by_key[key] for key in keys]
+
+    def snapshot(self):
+        with self._lock:
+            cached = len(self._cache)
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "cached_messages": cached,
+            "deferred_rate": round(self.stats["deferred"] / calls, 3) if calls else None,
+        }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+
+from llm_interface import ISSUE_AGENT_TYPES, generate_intro_async, llm_scheduler
+
+load_dotenv()
+
+INTRO_VARIANTS = int(os.getenv("INTRO_VARIANTS", 3))
+INTRO_REFRESH_S = float(os.getenv("INTRO_REFRESH_S", 6 * 3600))
+INTRO_FILL_INTERVAL_S = float(os.getenv("INTRO_FILL_INTERVAL_S", 5))     # at most one fill call per interval
+INTRO_FILL_HEADROOM = float(os.getenv("INTRO_FILL_HEADROOM", 0.5))        # share of the request budget left free
+
+
+class IntroCache:
+    """
+    Precomputed /generate_intro replies for the known agent types, generated off the
+    request path.
+    - A background task fills `variants` intros per type at startup and regenerates
+      them every `refresh_interval` seconds. Types are filled round-robin, so each gets
+      its first intro early; a type's refreshed pool replaces the old one whole, and a
+      type whose generation fails keeps its old pool. Templated fallbacks are never stored.
+    - Filling is low priority: one call at a time, at most one per `fill_interval`, and
+      only while `has_headroom()` says the shared LLM budget has room, so /chat traffic
+      after a deploy isn't queued behind it.
+    - get() only reads memory: a random variant, or None (unknown type, or nothing
+      generated yet) so the caller decides what to serve.
+    """
+
+    def __init__(self, generate, agent_types, variants=INTRO_VARIANTS, refresh_interval=INTRO_REFRESH_S,
+                 fill_interval=INTRO_FILL_INTERVAL_S, has_headroom=lambda: True):
+        self._generate = generate
+        self.agent_types = list(agent_types)
+        self.variants = variants
+        self.refresh_interval = refresh_interval
+        self.fill_interval = fill_interval
+        self._has_headroom = has_headroom
+        self._pools = {}
+        self._refresher = None
+        self.filled_at = None
+        self.stats = {"fills": 0, "generated": 0, "generate_errors": 0, "headroom_waits": 0, "hits": 0, "misses": 0}
+
+    def get(self, agent_type):
+        pool = self._pools.get(agent_type)
+        if not pool:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return random.choice(pool)
+
+    async def _generate_low_priority(self, agent_type):
+        while not self._has_headroom():
+            self.stats["headroom_waits"] += 1
+            await asyncio.sleep(self.fill_interval)
+        try:
+            intro = await self._generate(agent_type)
+            self.stats["generated"] += 1
+        except Exception as e:
+            self.stats["generate_errors"] += 1
+            print(f"[!] Intro generation failed for {agent_type}: {e}")
+            intro = None
+        await asyncio.sleep(self.fill_interval)
+        return intro
+
+    async def fill(self):
+        fresh = {agent_type: [] for agent_type in self.agent_types}
+        for _ in range(self.variants):
+            for agent_type in self.agent_types:
+                intro = await self._generate_low_priority(agent_type)
+                if intro:
+                    fresh[agent_type].append(intro)
+                    if not self._pools.get(agent_type):
+                        self._pools[agent_type] = tuple(fresh[agent_type])  # first fill: serve it right away
+        for agent_type, intros in fresh.items():
+            if intros:
+                self._pools[agent_type] = tuple(intros)
+        self.stats["fills"] += 1
+        self.filled_at = time.time()
+
+    def start_refresher(self):
+        """Starts the fill / refresh task on the running event loop (once)."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.fill()
+                print(f"[INTROS] {sum(len(p) for p in self._pools.values())} intros for {len(self._pools)} agent types")
+            except Exception as e:
+                print(f"[!] Intro precompute failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def info(self):
+        return {
+            **self.stats,
+            "agent_types": {agent_type: len(pool) for agent_type, pool in self._pools.items()},
+            "filled_at": self.filled_at,
+        }
+
+
+def _request_headroom():
+    bucket = llm_scheduler.requests
+    return bucket.available() >= bucket.capacity * INTRO_FILL_HEADROOM
+
+
+intro_cache = IntroCache(lambda agent_type: generate_intro_async(agent_type, allow_fallback=False), ISSUE_AGENT_TYPES,
+                         has_headroom=_request_headroom)
@@ -0,0 +1,144 @@
+import os
+import argparse
+import mysql.connector
+from dotenv import load_dotenv
+
+from llm_interface import phrase_workaround
+
+# Load env vars
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv("DB_HOST"),
+    'port': int(os.getenv("DB_PORT", 3306)),
+    'user': os.getenv("DB_USER"),
+    'password': os.getenv("DB_PASSWORD"),
+    'database': os.getenv("DB_NAME")
+}
+
+# Number of precomputed phrasings stored per known failure
+PHRASING_VARIANTS = int(os.getenv("PHRASING_VARIANTS", 3))
+
+# Known failure patterns and workarounds
+known_failures = [
+    {
+        "failure_type": "Invalid Postcode",
+        "pattern": "%postcode is not valid%",
+        "workaround": "Please verify the delivery postcode and ensure it is serviceable."
+    },
+    {
+        "failure_type": "Hazmat Issue",
+        "pattern": "%Hazmat ID/Class%",
+        "workaround": "Check SKU hazmat ID and classification and remove restricted items before retrying."
+    },
+    {
+        "failure_type": "Null Payload",
+        "pattern": "",
+        "workaround": "Kindly try repacking the container into a new container."
+    }
+]
+
+def insert_known_failures():
+    conn = cursor = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        # Create table if not exists
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS known_failures (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                failure_type VARCHAR(100),
+                pattern TEXT,
+                workaround TEXT
+            )
+        """)
+
+        # Insert known failure records
+        for error in known_failures:
+            cursor.execute("""
+                INSERT INTO known_failures (failure_type, pattern, workaround)
+                VALUES (%s, %s, %s)
+            """, (error["failure_type"], error["pattern"], error["workaround"]))
+
+        conn.commit()
+        print(f"{len(known_failures)} known failures inserted.")
+
+    except mysql.connector.Error as err:
+        print(f"MySQL Error: {err}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def precompute_workaround_phrasings(variants=PHRASING_VARIANTS):
+    """
+    Generates user-facing phrasings for every known failure that doesn't have any yet and
+    stores them in workaround_phrasings. The chat agent serves these instantly instead of
+    asking the LLM to rephrase the same workaround on every failed order.
+    Safe to re-run as a batch job: rows that already have phrasings are skipped.
+    """
+    conn = cursor = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS workaround_phrasings (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                failure_type VARCHAR(100),
+                workaround TEXT,
+                phrasing TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            SELECT kf.failure_type, kf.workaround
+            FROM known_failures kf
+            WHERE kf.workaround IS NOT NULL
+              AND NOT EXISTS (
+                SELECT 1 FROM workaround_phrasings wp
+                WHERE wp.failure_type = kf.failure_type AND wp.workaround = kf.workaround
+              )
+        """)
+        pending = cursor.fetchall()
+
+        stored = 0
+        for row in pending:
+            # No templated fallback here: a failed call leaves the row for the next run
+            try:
+                phrasings = [phrase_workaround(row["workaround"], row["failure_type"], allow_fallback=False)
+                             for _ in range(variants)]
+            except Exception as e:
+                print(f"[!] Phrasing failed for {row['failure_type']}, left for the next run: {e}")
+                continue
+            cursor.executemany("""
+                INSERT INTO workaround_phrasings (failure_type, workaround, phrasing)
+                VALUES (%s, %s, %s)
+            """, [(row["failure_type"], row["workaround"], phrasing) for phrasing in phrasings])
+            conn.commit()
+            stored += 1
+            print(f"{len(phrasings)} phrasings stored for {row['failure_type']}.")
+
+        print(f"Phrasings generated for {stored} of {len(pending)} known failures.")
+
+    except mysql.connector.Error as err:
+        print(f"MySQL Error: {err}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed known_failures and precompute workaround phrasings")
+    parser.add_argument("--phrasings-only", action="store_true",
+                        help="skip inserting known failures; only generate missing phrasings (batch job)")
+    args = parser.parse_args()
+
+    if not args.phrasings_only:
+        insert_known_failures()
+    precompute_workaround_phrasings()
@@ -0,0 +1,106 @@
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+from failure_matcher import KnownFailureMatcher
+
+load_dotenv()
+
+KNOWN_FAILURES_REFRESH_S = float(os.getenv("KNOWN_FAILURES_REFRESH_S", 30))
+
+
+class KnownFailuresSnapshot:
+    """Immutable view of the known_failures table as of one load, with its compiled matcher."""
+
+    def __init__(self, rows, version, phrasings=()):
+        self.rows = tuple(rows)
+        self.version = version
+        self.loaded_at = time.time()
+        self.matcher = KnownFailureMatcher(self.rows)
+        self.by_label = {}
+        for row in self.rows:
+            for key in (row.get("label"), row.get("failure_type")):
+                if key and key not in self.by_label:
+                    self.by_label[key] = row
+
+        # Precomputed user-facing phrasings keyed by (failure_type, workaround text)
+        self.phrasings = {}
+        for row in phrasings:
+            self.phrasings.setdefault((row["failure_type"], row["workaround"]), []).append(row["phrasing"])
+
+    def get_phrasing(self, failure_type, workaround):
+        variants = self.phrasings.get((failure_type, workaround))
+        return random.choice(variants) if variants else None
+
+
+class KnownFailuresCache:
+    """
+    In-process copy of known_failures.
+    - Loaded once (startup or first use), then served from memory.
+    - A background thread checks the table version every `refresh_interval`
+      seconds and reloads only when it changed.
+    - reload() forces a fresh load (e.g. right after inserting new patterns).
+    """
+
+    def __init__(self, load_rows, fetch_version, load_phrasings=None, refresh_interval=KNOWN_FAILURES_REFRESH_S):
+        self._load_rows = load_rows
+        self._load_phrasings = load_phrasings
+        self._fetch_version = fetch_version
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.stats = {"loads": 0, "version_checks": 0, "refresh_errors": 0}
+
+    def snapshot(self) -> KnownFailuresSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            snap = self.reload()
+        return snap
+
+    def reload(self) -> KnownFailuresSnapshot:
+        with self._lock:
+            version = self._fetch_version()
+            rows = self._load_rows()
+            phrasings = self._load_phrasings() if self._load_phrasings else ()
+            self._snapshot = KnownFailuresSnapshot(rows, version, phrasings)
+            self.stats["loads"] += 1
+            print(f"[known_failures] loaded {len(rows)} patterns (version {version})")
+            return self._snapshot
+
+    def refresh_if_changed(self) -> bool:
+        self.stats["version_checks"] += 1
+        version = self._fetch_version()
+        current = self._snapshot
+        if current is not None and current.version == version:
+            return False
+        self.reload()
+        return True
+
+    def start_refresher(self):
+        if self._refresher is not None:
+            return
+
+        def _loop():
+            while True:
+                time.sleep(self.refresh_interval)
+                try:
+                    self.refresh_if_changed()
+                except Exception as e:
+                    self.stats["refresh_errors"] += 1
+                    print(f"[!] known_failures refresh failed: {e}")
+
+        self._refresher = threading.Thread(target=_loop, name="known-failures-refresh", daemon=True)
+        self._refresher.start()
+
+    def info(self):
+        snap = self._snapshot
+        return {
+            "patterns": len(snap.rows) if snap else 0,
+            "precomputed_phrasings": sum(len(v) for v in snap.phrasings.values()) if snap else 0,
+            "version": snap.version if snap else None,
+            "loaded_at": snap.loaded_at if snap else None,
+            **self.stats,
+        }
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", 3600))
+LLM_CACHE_MAX_KEYS = int(os.getenv("LLM_CACHE_MAX_KEYS", 256))
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", 3))
+
+
+class _Entry:
+    __slots__ = ("variants", "next_index", "created_at")
+
+    def __init__(self):
+        self.variants = []
+        self.next_index = 0
+        self.created_at = time.monotonic()
+
+
+class ResponseCache:
+    """
+    Cache for constant-prompt LLM calls (greetings, thanks, ID requests, intros).
+
+    Each key keeps a small pool of up to `variants` different replies. Until the pool
+    is full every lookup is a miss, so the caller asks the LLM and adds the reply.
+    After that, replies are served round-robin so users still see some variety.
+    Keys expire `ttl` seconds after they were first filled. The least recently used
+    key is evicted beyond `max_keys`.
+    """
+
+    def __init__(self, ttl=LLM_CACHE_TTL_S, max_keys=LLM_CACHE_MAX_KEYS, variants=LLM_CACHE_VARIANTS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.variants = variants
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def make_key(system_prompt, prompt, **params):
+        """params are the request parameters (model, temperature, ...); may hold lists/dicts."""
+        return (system_prompt, prompt, json.dumps(params, sort_keys=True))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None or len(entry.variants) < self.variants:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            reply = entry.variants[entry.next_index % len(entry.variants)]
+            entry.next_index += 1
+            self._stats["hits"] += 1
+            return reply
+
+    def put(self, key, reply):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            self._entries.move_to_end(key)
+            if len(entry.variants) < self.variants:
+                entry.variants.append(reply)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "keys": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
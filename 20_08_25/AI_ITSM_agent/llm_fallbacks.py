@@ -0,0 +1,132 @@
+import json
+import re
+
+import confirmation_rules
+from id_scanner import scan_ids
+
+# Deterministic stand-ins for every llm_interface call, served while the LLM circuit
+# is open (or a call fails). Plain keyword rules and fixed templates: less friendly
+# than the LLM, but the incident flow keeps moving.
+
+_INTENT_KEYWORDS = [
+    ("end_of_convo", r"\b(bye|goodbye|that's all|that is all|nothing else)\b"),
+    ("thanks", r"\b(thanks|thank you|thx|cheers)\b"),
+    ("new_issue", r"\b(new|another|different) (issue|incident|problem)\b"),
+    ("summary", r"\b(status|check|summary|report of|details|progress)\b"),
+    ("greeting", r"^\s*(hi|hello|hey|good (morning|afternoon|evening))\b"),
+]
+
+_ISSUE_KEYWORDS = [
+    ("pack_itsm", ("pack", "label", "postcode", "print", "carrier", "hazmat")),
+    ("location", ("location", "bin", "aisle", "slot")),
+    ("health_check", ("health", "monitor", "down", "outage")),
+    ("user_account", ("account", "login", "log in", "password", "access", "user")),
+    ("hsn_code", ("hsn",)),
+    ("design", ("design", "workflow")),
+]
+
+
+def keyword_intent(user_input):
+    text = user_input.lower()
+    for intent, pattern in _INTENT_KEYWORDS:
+        if re.search(pattern, text):
+            return intent
+    return "normal"
+
+
+def user_confirmation(reply_text):
+    """Reply to "Do you still notice an issue?": yes means the issue persists."""
+    return confirmation_rules.issue_reply(reply_text)[0]
+
+
+def interpret_user_confirmation(reply_text):
+    """Reply to "Did the workaround resolve the issue?": yes means success."""
+    return confirmation_rules.workaround_reply(reply_text)[0]
+
+
+def turn_analysis(user_input):
+    """Same JSON shape analyze_turn asks the LLM for."""
+    return json.dumps({"intent": keyword_intent(user_input), **scan_ids(user_input)[0]})
+
+
+def classify_issue_intent(message):
+    text = message.lower()
+    for agent_type, keywords in _ISSUE_KEYWORDS:
+        if any(kw in text for kw in keywords):
+            return agent_type
+    return "unknown"
+
+
+GREETING = "Hey! I'm Pack assist. How can I help you today?"
+THANKS = "Glad I could help! Let me know if there's anything else."
+MISSING_BOTH_IDS = "Could you share the Order ID or Container ID so I can look into this?"
+MISSING_ORDER_ID = "Could you please share the Order ID as well?"
+MISSING_CONTAINER_ID = "Could you please share the Container ID as well?"
+MISSING_SUMMARY_IDS = "Could you share an Incident ID, Order ID or Container ID so I can pull up the summary?"
+
+
+def request_missing_id(order_id, container_id):
+    if not order_id and not container_id:
+        return MISSING_BOTH_IDS
+    if not order_id:
+        return MISSING_ORDER_ID
+    return MISSING_CONTAINER_ID
+
+
+def phrase_workaround(workaround_text, issue_type):
+    lines = [
+        "Apologies for the trouble, this is a known issue.",
+        "",
+        f"Workaround: {workaround_text}",
+    ]
+    if issue_type == "Hazmat Issue":
+        lines.append("Please check the SKU table for details related to this hazmat SKU issue.")
+    elif issue_type == "Invalid Postcode":
+        lines.append("Please verify the postcode in the order table for the affected order.")
+    lines += ["", "Could you let me know if the workaround worked, so we can close the incident?"]
+    return "\n".join(lines)
+
+
+def draft_email_content(issue_summary):
+    return (
+        "Dear IT Team,\n\n"
+        "Please find the details of the issue below:\n\n"
+        f"{issue_summary.strip()}\n\n"
+        "Kindly investigate and resolve the issue. Please reach out to the flow room/user for any further details.\n\n"
+        "Best Regards,\n"
+        "IT Support Agent"
+    )
+
+
+_STATUS_NOTES = {
+    "Open": "The suggested workaround didn't resolve the issue, so it has been escalated to IT.",
+    "In Progress": "The incident is waiting for your confirmation on the suggested workaround.",
+    "Resolved": "The issue has been resolved by the suggested workaround.",
+}
+
+
+def draft_summary_message(facts):
+    lines = []
+    if facts.get("incident_id"):
+        status = facts.get("incident_status") or "unknown"
+        lines.append(f"Incident {facts['incident_id']} is {status}.")
+        if status in _STATUS_NOTES:
+            lines.append(_STATUS_NOTES[status])
+        lines.append(f"Issue: {facts.get('issue_summary') or 'unknown'}")
+        lines.append(f"Suggested workaround: {facts.get('workaround') or 'unknown'}")
+    else:
+        lines.append("No incident has been logged for this order/container.")
+    return "\n".join(lines)
+
+
+def phrase_mismatch_or_notfound(context):
+    if context.get("type") == "mismatch":
+        return (f"Incident {context.get('incident_id')} belongs to a different order/container than the one you shared. "
+                "Which one should I use?")
+    identifier = (context.get("incident_id") or context.get("provided_order_id")
+                  or context.get("provided_container_id") or "the ID you shared")
+    return f"I couldn't find {identifier}. Could you recheck it or share another ID?"
+
+
+def agent_intro(agent_name):
+    return f"Hi, I'm your {agent_name} Agent. Could you describe the issue you're facing?"
@@ -1,31 +1,240 @@
 import os
 import json
 import re
+import time
+from contextvars import ContextVar
+from types import SimpleNamespace
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+import llm_fallbacks
+import reply_stream
+from async_utils import run_sync, loop_local
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+import confirmation_rules
+from hedging import HedgeBudget, LLM_HEDGE_QUANTILE, hedge_delay_s, run_hedged
+from id_scanner import scan_ids, is_ids_only
+from llm_cache import ResponseCache
+from local_classifier import label_log, local_classifiers
+from llm_metrics import llm_metrics
+from llm_profiles import constrain, get_profile, request_params
+from llm_scheduler import LLMScheduler, LLM_TIMEOUT_S
+from turn_memo import turn_memoized
 
 load_dotenv()
 
 # Load Groq API key
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
+# Optional: point the client at a Groq-compatible endpoint, e.g. groq_stub_server.py for offline load tests
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
 
-LLM_MODEL = "llama3-8b-8192"
+# HTTP attempts made by the current ask_llm call (retries included)
+_http_attempts: ContextVar = ContextVar("llm_http_attempts", default=None)
 
 
-def ask_llm(prompt, system_prompt="You are a helpful IT assistant at a Warehouse. Be natural and concise. Reduce ambiguity. Always address back or greet back only when it is greeting. Respond in a human like format. Respond casually and empathetically. Start with phrases like Hey, gotchu, Apologies or similar words based on the context before the main message. But be formal when composing a mail"):
-    """Generic LLM call using Groq-hosted LLaMA."""
-    response = client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7,
+async def _count_http_attempt(request):
+    attempts = _http_attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+
+def _make_client():
+    return AsyncGroq(
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        max_retries=0,  # retries/backoff are owned by llm_scheduler
+        timeout=LLM_TIMEOUT_S,
+        http_client=DefaultAsyncHttpxClient(event_hooks={"request": [_count_http_attempt]}),
     )
-    return response.choices[0].message.content.strip()
 
-def detect_intent(user_input: str) -> str:
+
+# One async client per event loop (FastAPI loop / sync bridge loop)
+get_client = loop_local(_make_client)
+
+# Below this scanner confidence extract_ids falls back to the LLM
+ID_SCAN_MIN_CONFIDENCE = float(os.getenv("ID_SCAN_MIN_CONFIDENCE", 0.8))
+
+# How often extract_ids could answer without the LLM
+id_extraction_stats = {"calls": 0, "llm_avoided": 0, "llm_calls": 0, "llm_failures": 0}
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful IT assistant at a Warehouse. Be natural and concise. Reduce ambiguity. Always address back or greet back only when it is greeting. Respond in a human like format. Respond casually and empathetically. Start with phrases like Hey, gotchu, Apologies or similar words based on the context before the main message. But be formal when composing a mail"
+
+
+# Replies for constant prompts (opt-in per call with cache=True)
+response_cache = ResponseCache()
+
+# Concurrency cap, RPM/TPM limits, retries and deadlines for every Groq call
+llm_scheduler = LLMScheduler()
+
+# Trips on error rate / slow calls; while open callers get their templated fallback
+llm_breaker = CircuitBreaker()
+
+# Caps the extra requests sent by hedged calls
+hedge_budget = HedgeBudget()
+
+# Completion budget assumed for rate limiting when a profile sets no max_tokens
+DEFAULT_COMPLETION_TOKENS_ESTIMATE = 256
+
+
+async def ask_llm_async(prompt, system_prompt=DEFAULT_SYSTEM_PROMPT, cache=False, call_site="ask_llm",
+                        fallback=None, hedge=False, profile=None):
+    """
+    Generic LLM call using Groq-hosted LLaMA (non-blocking).
+    cache=True serves the reply from response_cache; only use it for prompts that
+    don't depend on user input.
+    call_site names the caller in llm_metrics (latency, tokens, errors, retries).
+    fallback is a zero-arg callable returning the reply to use when llm_breaker is
+    open or the call fails. Without it those cases raise (CircuitOpenError when open).
+    hedge=True sends a second identical request once the call has taken longer than the
+    call site's observed p90 (within hedge_budget); the first answer wins. Only for
+    short, idempotent classifier calls.
+    Model and generation parameters come from the call site's profile (llm_profiles.py);
+    `profile` overrides it, e.g. for benchmarks.
+    Inside reply_stream.streaming(), call sites whose profile sets "stream" are requested
+    with stream=True and their tokens are forwarded as they arrive; cached and fallback
+    replies are forwarded whole.
+    """
+    profile = profile or get_profile(call_site)
+    params = request_params(profile)
+    stream = bool(profile.get("stream")) and reply_stream.active()
+    cache_key = ResponseCache.make_key(system_prompt, prompt, **params) if cache else None
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            llm_metrics.record_cache_hit(call_site)
+            if stream:
+                reply_stream.emit(cached)
+            return cached
+
+    breaker_ticket = llm_breaker.allow()
+    if breaker_ticket is None:
+        if fallback is None:
+            raise CircuitOpenError(f"LLM circuit open ({call_site})")
+        llm_breaker.stats["fallbacks"] += 1
+        reply = fallback()
+        if stream:
+            reply_stream.emit(reply)
+        return reply
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+    def _create():
+        return get_client().chat.completions.create(messages=messages, **params)
+
+    first_token_ms = []
+
+    async def _create_streamed():
+        # Forwards the stripped text (what the caller gets back) as tokens arrive
+        parts, pending, usage = [], "", None
+        async for chunk in await get_client().chat.completions.create(messages=messages, stream=True, **params):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not first_token_ms:
+                    first_token_ms.append((time.perf_counter() - start) * 1000)
+                text = pending + delta
+                if not parts:
+                    text = text.lstrip()
+                body = text.rstrip()
+                pending = text[len(body):]
+                if body:
+                    parts.append(body)
+                    reply_stream.emit(body)
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None):
+                usage = x_groq.usage
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(parts)))],
+                               usage=usage)
+
+    estimated_tokens = ((len(system_prompt) + len(prompt)) // 4
+                        + (params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS_ESTIMATE))
+    attempts = [0]
+    attempts_token = _http_attempts.set(attempts)
+    delay_s = None
+    if hedge:
+        hedge_budget.count_call()
+        delay_s = hedge_delay_s(llm_metrics.latency_quantile(call_site, LLM_HEDGE_QUANTILE),
+                                llm_metrics.latency_samples(call_site))
+    hedged = False
+    start = time.perf_counter()
+    try:
+        (response, reserved_tokens), hedged, hedge_won = await run_hedged(
+            lambda: llm_scheduler.run(_create_streamed if stream else _create, estimated_tokens),
+            delay_s, hedge_budget)
+    except Exception as e:
+        latency_ms = (time.perf_counter() - start) * 1000
+        llm_breaker.record(breaker_ticket, failed=True, latency_ms=latency_ms)
+        llm_metrics.record_call(call_site, latency_ms, retries=max(0, attempts[0] - 1 - hedged), error=e)
+        if fallback is None:
+            raise
+        print(f"⚠️ LLM call failed at {call_site} ({type(e).__name__}), using templated reply")
+        llm_breaker.stats["fallbacks"] += 1
+        reply = fallback()
+        if stream:
+            reply_stream.emit(reply)
+        return reply
+    except BaseException:
+        llm_breaker.release(breaker_ticket)  # cancelled: says nothing about LLM health
+        raise
+    finally:
+        _http_attempts.reset(attempts_token)
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    llm_breaker.record(breaker_ticket, failed=False, latency_ms=latency_ms)
+    if hedged:
+        llm_metrics.record_hedge(call_site, hedge_won)
+    usage = response.usage
+    if usage:
+        llm_scheduler.tokens.adjust(usage.total_tokens - reserved_tokens)
+    # Non-streamed calls get their first token with the whole completion
+    llm_metrics.record_call(
+        call_site, latency_ms, ttft_ms=first_token_ms[0] if first_token_ms else latency_ms,
+        prompt_tokens=usage.prompt_tokens if usage else 0,
+        completion_tokens=usage.completion_tokens if usage else 0,
+        retries=max(0, attempts[0] - 1 - hedged),
+    )
+    reply = constrain((response.choices[0].message.content or "").strip(), profile)
+
+    if cache_key is not None:
+        response_cache.put(cache_key, reply)
+    return reply
+
+
+def ask_llm(prompt, system_prompt=DEFAULT_SYSTEM_PROMPT, cache=False, call_site="ask_llm", fallback=None,
+            hedge=False, profile=None):
+    """Blocking wrapper around ask_llm_async for sync callers (CLI)."""
+    return run_sync(ask_llm_async(prompt, system_prompt, cache=cache, call_site=call_site, fallback=fallback,
+                                  hedge=hedge, profile=profile))
+
+
+async def _classify(classifier, text, prompt, fallback, normalize):
+    """
+    Closed-label classification: the local model (local_classifier.py) answers when it is
+    confident, otherwise the LLM does and its label is logged as training data.
+    Templated fallback labels are not logged.
+    """
+    label = local_classifiers.predict(classifier, text)
+    if label is not None:
+        return normalize(label)
+
+    served_by_fallback = False
+
+    def _fallback():
+        nonlocal served_by_fallback
+        served_by_fallback = True
+        return fallback()
+
+    start = time.perf_counter()
+    label = normalize(await ask_llm_async(prompt, call_site=classifier, hedge=True, fallback=_fallback))
+    if not served_by_fallback:
+        label_log.record(classifier, text, label, (time.perf_counter() - start) * 1000)
+    return label
+
+
+@turn_memoized("llm")
+async def detect_intent_async(user_input: str) -> str:
     """
     Uses the LLM to classify the user input into:
     - greeting: user greets
@@ -43,8 +252,17 @@ def detect_intent(user_input: str) -> str:
         "Respond with only one word: greeting, thanks, end_of_convo, new_issue, summary or normal."
     )
 
-    response = ask_llm(prompt)
-    intent = response.strip().lower()
+    return await _classify("detect_intent", user_input, prompt,
+                           fallback=lambda: llm_fallbacks.keyword_intent(user_input),
+                           normalize=lambda response: _normalize_intent(response, user_input))
+
+
+INTENTS = ["greeting", "thanks", "end_of_convo", "new_issue", "summary", "normal"]
+SUCCESS_CONFIRMATIONS = ["issue_persists", "issue_resolved", "unclear"]
+
+
+def _normalize_intent(raw_intent, user_input):
+    intent = (raw_intent or "").strip().lower()
 
     if intent not in ["greeting", "thanks", "new_issue", "end_of_convo", "summary"]:
         intent = "normal"
@@ -57,19 +275,112 @@ def detect_intent(user_input: str) -> str:
     return intent
 
 
-def handle_greeting():
+@turn_memoized("llm")
+async def analyze_turn_async(user_input: str) -> dict:
+    """
+    One structured LLM call per turn returning intent and IDs:
+      {"intent", "order_id", "container_id", "incident_id", "ids_only"}
+    - A message made only of confidently scanned IDs needs no LLM at all (intent=None,
+      ids_only=True, the caller keeps the previous intent).
+    - Confidently scanned IDs plus a confident local intent model answer without the
+      LLM too (see local_classifier.py).
+    - If the JSON can't be parsed/validated, falls back to extract_ids + detect_intent.
+    """
+    scanned, confidence = scan_ids(user_input)
+    ids_confident = confidence >= ID_SCAN_MIN_CONFIDENCE
+
+    if ids_confident and any(scanned.values()) and is_ids_only(user_input):
+        return {**scanned, "intent": None, "ids_only": True}
+
+    if ids_confident:
+        intent = local_classifiers.predict("detect_intent", user_input)
+        if intent is not None:
+            return {**scanned, "intent": _normalize_intent(intent, user_input), "ids_only": False}
+
+    prompt = f"""
+Analyse this warehouse support chat message:
+"{user_input}"
+
+Return a **valid JSON only** with these fields:
+{{
+  "intent": one of greeting, thanks, end_of_convo, new_issue, summary, normal,
+  "order_id": "ORD" followed by digits, e.g. ORD69021, or null,
+  "container_id": "CONT" followed by digits, e.g. CONT12345, or null,
+  "incident_id": "INC-YYYYMMDD-######", e.g. INC-20250819-001143, or null
+}}
+
+Intent meanings:
+- greeting: user greets
+- thanks: user expresses gratitude
+- end_of_convo: user wants to end the conversation
+- new_issue: user explicitly wants to log a new issue/incident
+- summary: user asks for summary/status/details of an order/container/incident
+- normal: user directly reports an issue (e.g., 'issue with packing', 'label not printing')
+
+Return full IDs exactly as they appear in the message; use null when an ID is not present.
+"""
+
+    served_by_fallback = False
+
+    def _fallback():
+        nonlocal served_by_fallback
+        served_by_fallback = True
+        return llm_fallbacks.turn_analysis(user_input)
+
+    try:
+        start = time.perf_counter()
+        response = await ask_llm_async(
+            prompt, system_prompt="You are an expert message classifier and data extractor. Respond ONLY with JSON.",
+            call_site="analyze_turn", hedge=True, fallback=_fallback,
+        )
+        latency_ms = (time.perf_counter() - start) * 1000
+        json_str = re.search(r'\{.*\}', response, re.DOTALL)
+        parsed = json.loads(json_str.group()) if json_str else None
+        if not isinstance(parsed, dict) or str(parsed.get("intent", "")).strip().lower() not in INTENTS:
+            raise ValueError(f"invalid turn analysis: {response!r}")
+
+        result = {key: parsed.get(key) if isinstance(parsed.get(key), str) else None
+                  for key in ("order_id", "container_id", "incident_id")}
+        if ids_confident:
+            result.update(scanned)
+        result["intent"] = _normalize_intent(parsed["intent"], user_input)
+        result["ids_only"] = False
+        if not served_by_fallback:
+            label_log.record("detect_intent", user_input, result["intent"], latency_ms)
+        return result
+    except Exception as e:
+        print(f"⚠️ Turn analysis failed ({e}), falling back to separate calls...")
+
+    result = await extract_ids_async(user_input)
+    result["intent"] = await detect_intent_async(user_input)
+    result["ids_only"] = False
+    return result
+
+
+async def handle_greeting_async():
     prompt = "The user greeted you. Respond with a warm greeting.  Introduce yourself as Pack assist and ask how you can help. Do not tell anything beyond this"
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, cache=True, call_site="handle_greeting",
+                               fallback=lambda: llm_fallbacks.GREETING)
 
-def handle_thanks():
+async def handle_thanks_async():
     prompt = "The user thanked you. Respond with a warm and polite message like 'Glad I could help!'"
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, cache=True, call_site="handle_thanks",
+                               fallback=lambda: llm_fallbacks.THANKS)
 
-def extract_ids(message):
+@turn_memoized("llm")
+async def extract_ids_async(message):
     """
-    Use LLM to extract order ID and/or container ID from user message.
-    Fallback to regex if LLM fails or returns bad format.
+    Extract order/container/incident IDs from the user message.
+    The deterministic scanner runs first; the LLM is only asked when the scanner
+    found nothing usable or the text is ambiguous (see id_scanner.py).
+    Falls back to the scanner result if the LLM fails or returns bad format.
     """
+    id_extraction_stats["calls"] += 1
+    scanned, confidence = scan_ids(message)
+    if confidence >= ID_SCAN_MIN_CONFIDENCE:
+        id_extraction_stats["llm_avoided"] += 1
+        return scanned
+
     prompt = f"""
 You are a support agent. Extract **full IDs** from this message:
 "{message}"
@@ -94,7 +405,9 @@ Return a **valid JSON only**, like this:
 """
 
     try:
-        response = ask_llm(prompt, system_prompt="You are an expert data extractor. Respond ONLY with JSON.")
+        id_extraction_stats["llm_calls"] += 1
+        response = await ask_llm_async(prompt, system_prompt="You are an expert data extractor. Respond ONLY with JSON.",
+                                       call_site="extract_ids", fallback=lambda: json.dumps(scanned))
         json_str = re.search(r'\{.*\}', response)
         if json_str:
             parsed = json.loads(json_str.group())
@@ -106,20 +419,12 @@ Return a **valid JSON only**, like this:
     except Exception as e:
         print("⚠️ LLM ID extraction failed, trying regex...")
 
-    # Fallback to regex extraction
-    order_match = re.search(r'\bORD[-]?\d+\b', message, re.IGNORECASE)
-    container_match = re.search(r'\bCONT[-]?\d+\b', message, re.IGNORECASE)
-    incident_match = re.search(r'\bINC-\d{8}-\d{6}\b', message, re.IGNORECASE)
-
+    # Fallback to the regex scanner result
+    id_extraction_stats["llm_failures"] += 1
+    return scanned
 
-    return {
-        "order_id": order_match.group().upper() if order_match else None,
-        "container_id": container_match.group().upper() if container_match else None,
-        "incident_id": incident_match.group().upper() if incident_match else None
-    }
 
-
-def request_missing_id(order_id, container_id):
+async def request_missing_id_async(order_id, container_id):
     """Ask user for missing order/container ID using LLM phrasing. Greet only if greeted here"""
     if not order_id and not container_id:
         prompt = "Do not greet here. The user hasn't provided any Order ID or Container ID. Be casual and ask them politely to share either one so we can assist, in a humanly format"
@@ -130,11 +435,17 @@ def request_missing_id(order_id, container_id):
     else:
         return None  # Nothing missing
 
-    return ask_llm(prompt, system_prompt="You are a polite support assistant. Ask in a concise and short manner. Like in a chat")
+    return await ask_llm_async(prompt, system_prompt="You are a polite support assistant. Ask in a concise and short manner. Like in a chat",
+                               cache=True, call_site="request_missing_id",
+                               fallback=lambda: llm_fallbacks.request_missing_id(order_id, container_id))
 
 
-def phrase_workaround(workaround_text, issue_type):
-    """Phrase a known workaround using LLM for a more natural response."""
+async def phrase_workaround_async(workaround_text, issue_type, allow_fallback=True):
+    """
+    Phrase a known workaround using LLM for a more natural response.
+    allow_fallback=False raises instead of returning the templated text (used when
+    the result is stored, see known_failures.precompute_workaround_phrasings).
+    """
     prompt =  (
         "No need to say Hi or do any greeting here.\n\n"
         "We identified an issue with the provided order or container.\n\n"
@@ -156,10 +467,12 @@ def phrase_workaround(workaround_text, issue_type):
         "- Do not combine sentences into a single paragraph."
     )
 
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, call_site="phrase_workaround",
+                               fallback=(lambda: llm_fallbacks.phrase_workaround(workaround_text, issue_type))
+                               if allow_fallback else None)
 
 
-def draft_email_content(issue_summary):
+async def draft_email_content_async(issue_summary):
     """Generate escalation email using LLM."""
 
     prompt = f"""
@@ -171,13 +484,20 @@ Issue summary:
 
 No need to include subject in the mail body . Do not say anything like drafted mail or similar(e.g. do not mention Here is the draft email:). Do not place any generic placeholders. Keep it short, simple, formal, and clear. End with a request for IT team to investigate and resolve. Do ask IT team to reach out to the flow room/user for further details related to the issue. Just add Best Regards, IT Support Agent at end.
 """
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, call_site="draft_email_content",
+                               fallback=lambda: llm_fallbacks.draft_email_content(issue_summary))
 
 
-def interpret_user_confirmation(reply_text):
+@turn_memoized("llm")
+async def interpret_user_confirmation_async(reply_text):
     """
     Use LLM to interpret whether user's reply means success, failure, or ambiguous
+    (clear replies are parsed by confirmation_rules without it)
     """
+    result = confirmation_rules.fast_path("workaround", reply_text)
+    if result is not None:
+        return result
+
     prompt = f"""
 You are an IT service assistant. A workaround was suggested to a user. They replied with:
 
@@ -191,18 +511,17 @@ Classify this response into one of the following categories:
 
 Respond with only one word: success, failure, or unclear.
 """
-    return ask_llm(prompt).strip().lower()
-
-def user_confirmation(reply_text):
-    text = reply_text.strip().lower()
-
-    # Directly handle simple yes/no without LLM
-    if text in ["no", "nope", "nah"]:
-        return "issue_resolved"
-    if text in ["yes", "yeah", "yep", "still", "yes it persists"]:
-        return "issue_persists"
+    return await _classify("interpret_user_confirmation", reply_text, prompt,
+                           fallback=lambda: llm_fallbacks.interpret_user_confirmation(reply_text),
+                           normalize=lambda response: response.strip().lower())
+
+@turn_memoized("llm")
+async def user_confirmation_async(reply_text):
+    # Clear replies ("yes", "nope all fixed", "still failing") without LLM
+    result = confirmation_rules.fast_path("issue", reply_text)
+    if result is not None:
+        return result
 
-    
     prompt = f"""
 You are an IT service assistant. You asked the user whether they still notice an issue with their order.
 They replied with:
@@ -217,23 +536,34 @@ Classify this response into one of the following categories:
 
 Respond with only one word: issue_persists, issue_resolved, or unclear.
 """
-    result = ask_llm(prompt).strip().lower()
-    if result in ["issue_persists", "issue_resolved", "unclear"]:
-        return result
-    else:
-        return "unclear"
+    return await _classify("user_confirmation", reply_text, prompt,
+                           fallback=lambda: llm_fallbacks.user_confirmation(reply_text),
+                           normalize=_normalize_confirmation)
 
-def classify_issue_intent(message: str) -> str:
+
+def _normalize_confirmation(response):
+    result = response.strip().lower()
+    return result if result in SUCCESS_CONFIRMATIONS else "unclear"
+
+# Agent types the front door routes to (also indexed by intent_router.py)
+ISSUE_AGENT_TYPES = {
+    "pack_itsm": "Only Packing or label or postcode related issues.",
+    "location": "Location-related issues",
+    "health_check": "Health check or system monitoring",
+    "user_account": "User account creation or access issues or user related issues or user account issues",
+    "hsn_code": "HSN code-related issues",
+    "design": "Design or workflow queries",
+}
+
+
+@turn_memoized("llm")
+async def classify_issue_intent_async(message: str) -> str:
     """
     Use LLM to classify the message and map to one of the agent types.
     """
+    categories = "\n".join(f"- {agent_type}: {description}" for agent_type, description in ISSUE_AGENT_TYPES.items())
     prompt = f"""Classify the user's issue into one of the following categories:
-- pack_itsm: Only Packing or label or postcode related issues.
-- location: Location-related issues
-- health_check: Health check or system monitoring
-- user_account: User account creation or access issues or user related issues or user account issues
-- hsn_code: HSN code-related issues
-- design: Design or workflow queries
+{categories}
 
 If the message is unclear or not enough to classify, respond ONLY with: unknown
 
@@ -243,14 +573,18 @@ Respond with only one keyword: pack_itsm, location, health_check, user_account,
 
 Answer:""".strip()
 
-    response = ask_llm(prompt)  # Use your LLM calling function
+    return await _classify("classify_issue_intent", message, prompt,
+                           fallback=lambda: llm_fallbacks.classify_issue_intent(message),
+                           normalize=_normalize_issue_intent)
+
+
+def _normalize_issue_intent(response):
     classification = response.strip().lower()
 
-    allowed = {"pack_itsm", "location", "health_check", "user_account", "hsn_code", "design"}
-    return classification if classification in allowed else "unknown"
+    return classification if classification in ISSUE_AGENT_TYPES else "unknown"
 
 
-def request_missing_summary_ids() -> str:
+async def request_missing_summary_ids_async() -> str:
     """
     LLM phrases a short, friendly ask for any of the 3 IDs.
     """
@@ -259,16 +593,16 @@ The user asked for a summary but didn't provide identifiers.
 Write a single short sentence asking them to share ANY of: Incident ID, Order ID, or Container ID.
 Be friendly and clear. No greeting.
 """
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, cache=True, call_site="request_missing_summary_ids",
+                               fallback=lambda: llm_fallbacks.MISSING_SUMMARY_IDS)
 
 
-def draft_summary_message(facts: dict) -> str:
+async def draft_summary_message_async(facts: dict) -> str:
     """
     LLM composes a concise summary from structured facts.
     facts keys (any may be None): 
       incident_id, incident_status, incident_created_at, issue_summary,
-      order_id, container_id, 
-      cms_last_status, cms_last_time
+      workaround, order_id, container_id
     """
     prompt = f"""
 Compose a clear, neat and human-friendly summary from this JSON.
@@ -287,10 +621,11 @@ Constraints:
 - 3 to 6 short lines max.
 - If a field is null/missing, don't mention it.
 """
-    return ask_llm(prompt)
+    return await ask_llm_async(prompt, call_site="draft_summary_message",
+                               fallback=lambda: llm_fallbacks.draft_summary_message(facts))
 
 
-def phrase_mismatch_or_notfound(context: dict) -> str:
+async def phrase_mismatch_or_notfound_async(context: dict) -> str:
     """
     LLM phrasing for mismatch/notfound messages.
     context: 
@@ -307,4 +642,71 @@ Rules:
 - If type is "mismatch": explain the mismatch (e.g., Incident belongs to a different order/container) and ask which one to use.
 - No greeting; one or two sentences only.
 """
-    return ask_llm(prompt)    
+    return await ask_llm_async(prompt, call_site="phrase_mismatch_or_notfound",
+                               fallback=lambda: llm_fallbacks.phrase_mismatch_or_notfound(context))
+
+
+async def generate_intro_async(agent_type: str, allow_fallback=True) -> str:
+    """
+    Opening line of a chat window for `agent_type` (e.g. "pack_itsm").
+    allow_fallback=False raises instead of returning the templated intro and skips
+    response_cache (used when the result is stored, see intro_cache.py).
+    """
+    agent_name = agent_type.replace("_", " ").title()
+    prompt = f"""
+You are acting as the "{agent_name}" helpful support assistant.
+
+Introduce yourself clearly by saying something like "Hi, I'm your {agent_name} Agent" or similar. Be friendly and speak in helpful tone.
+
+Then politely ask the user to describe their issue. Do NOT ask for IDs, codes, or technical details — just prompt them to explain the issue.
+
+Respond in a single, human-friendly sentence or two.
+"""
+    response = await ask_llm_async(prompt, cache=allow_fallback, call_site="generate_intro",
+                                   fallback=(lambda: llm_fallbacks.agent_intro(agent_name)) if allow_fallback else None)
+    return response.strip()
+
+
+# --- Blocking wrappers (CLI / scripts). The API uses the *_async variants. ---
+
+def detect_intent(user_input: str) -> str:
+    return run_sync(detect_intent_async(user_input))
+
+def analyze_turn(user_input: str) -> dict:
+    return run_sync(analyze_turn_async(user_input))
+
+def handle_greeting():
+    return run_sync(handle_greeting_async())
+
+def handle_thanks():
+    return run_sync(handle_thanks_async())
+
+def extract_ids(message):
+    return run_sync(extract_ids_async(message))
+
+def request_missing_id(order_id, container_id):
+    return run_sync(request_missing_id_async(order_id, container_id))
+
+def phrase_workaround(workaround_text, issue_type, allow_fallback=True):
+    return run_sync(phrase_workaround_async(workaround_text, issue_type, allow_fallback))
+
+def draft_email_content(issue_summary):
+    return run_sync(draft_email_content_async(issue_summary))
+
+def interpret_user_confirmation(reply_text):
+    return run_sync(interpret_user_confirmation_async(reply_text))
+
+def user_confirmation(reply_text):
+    return run_sync(user_confirmation_async(reply_text))
+
+def classify_issue_intent(message: str) -> str:
+    return run_sync(classify_issue_intent_async(message))
+
+def request_missing_summary_ids() -> str:
+    return run_sync(request_missing_summary_ids_async())
+
+def draft_summary_message(facts: dict) -> str:
+    return run_sync(draft_summary_message_async(facts))
+
+def phrase_mismatch_or_notfound(context: dict) -> str:
+    return run_sync(phrase_mismatch_or_notfound_async(context))
@@ -0,0 +1,187 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets in milliseconds (upper bounds, last bucket is +Inf)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+# LLM calls per turn buckets
+CALLS_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10)
+
+MAX_TRACKED_SESSIONS = 1000
+# Log a line per turn ([METRICS], [STAGES], [MEMO]); /metrics has the same data either way
+TURN_DEBUG = os.getenv("TURN_DEBUG", "").lower() in ("1", "true", "yes")
+
+
+class Histogram:
+    """Fixed-bucket histogram plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets, window=1000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "buckets": {
+                **{f"le_{b}": c for b, c in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _CallSiteStats:
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.ttft_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.counters = defaultdict(int)
+
+    def snapshot(self):
+        return {
+            "latency_ms": self.latency_ms.snapshot(),
+            "ttft_ms": self.ttft_ms.snapshot(),
+            **self.counters,
+        }
+
+
+class _TurnStats:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.llm_calls = 0
+        self.llm_time_ms = 0.0
+        self.calls = []  # (call_site, latency_ms)
+
+
+_current_turn: ContextVar = ContextVar("llm_metrics_turn", default=None)
+
+
+class LLMMetrics:
+    """
+    Per-call-site LLM metrics (latency, time-to-first-token, tokens, errors, retries)
+    with per-turn and per-session rollups.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites = defaultdict(_CallSiteStats)
+        self._turn_calls = Histogram(CALLS_BUCKETS)
+        self._turn_llm_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._sessions = OrderedDict()
+        self._stream_ttfb_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._stream_total_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    def record_call(self, call_site, latency_ms, ttft_ms=None, prompt_tokens=0, completion_tokens=0,
+                    retries=0, error=None):
+        with self._lock:
+            site = self._sites[call_site]
+            site.counters["calls"] += 1
+            site.counters["retries"] += retries
+            if error is not None:
+                site.counters["errors"] += 1
+                site.counters[f"errors.{type(error).__name__}"] += 1
+            else:
+                site.latency_ms.observe(latency_ms)
+                if ttft_ms is not None:
+                    site.ttft_ms.observe(ttft_ms)
+                site.counters["prompt_tokens"] += prompt_tokens or 0
+                site.counters["completion_tokens"] += completion_tokens or 0
+
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.llm_calls += 1
+            turn.llm_time_ms += latency_ms
+            turn.calls.append((call_site, round(latency_ms, 1)))
+
+    def record_cache_hit(self, call_site):
+        with self._lock:
+            self._sites[call_site].counters["cache_hits"] += 1
+
+    def record_reply_stream(self, ttfb_ms, total_ms):
+        """A /chat/stream turn: time to the first reply byte and to the end of the reply."""
+        with self._lock:
+            self._stream_ttfb_ms.observe(ttfb_ms)
+            self._stream_total_ms.observe(total_ms)
+
+    def latency_quantile(self, call_site, q):
+        with self._lock:
+            site = self._sites.get(call_site)
+            return site.latency_ms.quantile(q) if site else None
+
+    def latency_samples(self, call_site):
+        with self._lock:
+            site = self._sites.get(call_site)
+            return len(site.latency_ms.recent) if site else 0
+
+    def record_hedge(self, call_site, won):
+        with self._lock:
+            site = self._sites[call_site]
+            site.counters["hedges"] += 1
+            if won:
+                site.counters["hedge_wins"] += 1
+
+    @contextmanager
+    def turn_scope(self, session_id):
+        """Collects every LLM call made while handling one chat turn."""
+        turn = _TurnStats(session_id)
+        token = _current_turn.set(turn)
+        try:
+            yield turn
+        finally:
+            _current_turn.reset(token)
+            self._finish_turn(turn)
+
+    def _finish_turn(self, turn):
+        with self._lock:
+            self._turn_calls.observe(turn.llm_calls)
+            self._turn_llm_ms.observe(turn.llm_time_ms)
+            session = self._sessions.pop(turn.session_id, None) or {"turns": 0, "llm_calls": 0, "llm_time_ms": 0.0}
+            session["turns"] += 1
+            session["llm_calls"] += turn.llm_calls
+            session["llm_time_ms"] = round(session["llm_time_ms"] + turn.llm_time_ms, 1)
+            session["last_turn"] = turn.calls
+            self._sessions[turn.session_id] = session
+            while len(self._sessions) > MAX_TRACKED_SESSIONS:
+                self._sessions.popitem(last=False)
+        if TURN_DEBUG:
+            print(f"[METRICS] turn session={turn.session_id} llm_calls={turn.llm_calls} "
+                  f"llm_time_ms={turn.llm_time_ms:.0f} calls={turn.calls}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "call_sites": {name: site.snapshot() for name, site in self._sites.items()},
+                "per_turn": {
+                    "llm_calls": self._turn_calls.snapshot(),
+                    "llm_time_ms": self._turn_llm_ms.snapshot(),
+                },
+                "sessions": dict(self._sessions),
+                "reply_stream": {
+                    "ttfb_ms": self._stream_ttfb_ms.snapshot(),
+                    "total_ms": self._stream_total_ms.snapshot(),
+                },
+            }
+
+
+llm_metrics = LLMMetrics()
+
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Generation profiles keyed by ask_llm call_site.
+#
+# A profile may set:
+#   model        Groq model id
+#   temperature
+#   max_tokens   completion cap (also used as the token estimate for rate limiting)
+#   stop         list of stop sequences
+#   choices      enum-constrained output: the reply is reduced to the first allowed word
+#   json         true to request a JSON object (response_format)
+#   stream       true for user-visible replies: streamed to the client while a
+#                reply stream is open (see reply_stream.py)
+#
+# Unknown call sites use "default". Overrides come from the JSON file named by
+# LLM_PROFILES_FILE (same shape as PROFILES, merged per call site), so models and
+# limits can be tuned without code changes.
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-8b-8192")
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", LLM_MODEL)
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "llama3-70b-8192")
+LLM_PROFILES_FILE = os.getenv("LLM_PROFILES_FILE")
+
+_CLASSIFIER = {"model": LLM_SMALL_MODEL, "temperature": 0.0, "max_tokens": 8, "stop": ["\n"]}
+_EXTRACTOR = {"model": LLM_SMALL_MODEL, "temperature": 0.0, "max_tokens": 150, "json": True}
+_CHAT_LINE = {"model": LLM_MODEL, "temperature": 0.7, "max_tokens": 100, "stream": True}
+
+PROFILES = {
+    "default": {"model": LLM_MODEL, "temperature": 0.7},
+
+    "detect_intent": {**_CLASSIFIER, "choices": ["greeting", "thanks", "end_of_convo", "new_issue", "summary", "normal"]},
+    "interpret_user_confirmation": {**_CLASSIFIER, "choices": ["success", "failure", "unclear"]},
+    "user_confirmation": {**_CLASSIFIER, "choices": ["issue_persists", "issue_resolved", "unclear"]},
+    "classify_issue_intent": {**_CLASSIFIER, "choices": ["pack_itsm", "location", "health_check", "user_account",
+                                                         "hsn_code", "design", "unknown"]},
+    "analyze_turn": _EXTRACTOR,
+    "extract_ids": _EXTRACTOR,
+
+    "handle_greeting": _CHAT_LINE,
+    "handle_thanks": _CHAT_LINE,
+    "request_missing_id": _CHAT_LINE,
+    "request_missing_summary_ids": _CHAT_LINE,
+    "phrase_mismatch_or_notfound": _CHAT_LINE,
+    "generate_intro": _CHAT_LINE,
+    "phrase_workaround": {"model": LLM_MODEL, "temperature": 0.5, "max_tokens": 250, "stream": True},
+
+    "draft_email_content": {"model": LLM_LARGE_MODEL, "temperature": 0.3, "max_tokens": 400, "stream": True},
+    "draft_summary_message": {"model": LLM_LARGE_MODEL, "temperature": 0.3, "max_tokens": 250, "stream": True},
+}
+
+
+def load_profiles(path=LLM_PROFILES_FILE):
+    """PROFILES with the per-call-site overrides from `path` merged in."""
+    profiles = {site: dict(profile) for site, profile in PROFILES.items()}
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        for site, override in overrides.items():
+            profiles[site] = {**profiles.get(site, profiles["default"]), **override}
+    return profiles
+
+
+profiles = load_profiles()
+
+
+def get_profile(call_site):
+    return profiles.get(call_site) or profiles["default"]
+
+
+def request_params(profile):
+    """Keyword arguments for chat.completions.create (everything but the messages)."""
+    params = {"model": profile["model"], "temperature": profile.get("temperature", 0.7)}
+    if profile.get("max_tokens"):
+        params["max_tokens"] = profile["max_tokens"]
+    if profile.get("stop"):
+        params["stop"] = list(profile["stop"])
+    if profile.get("json"):
+        params["response_format"] = {"type": "json_object"}
+    return params
+
+
+def constrain(reply, profile):
+    """Reduces the reply to the first allowed choice it mentions; unchanged if none (callers validate)."""
+    choices = profile.get("choices")
+    if not choices:
+        return reply
+    for word in re.findall(r"[a-z_]+", reply.lower()):
+        if word in choices:
+            return word
+    return reply
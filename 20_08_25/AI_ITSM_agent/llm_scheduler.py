@@ -0,0 +1,160 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+import groq
+
+from async_utils import loop_local
+
+load_dotenv()
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_RPM = float(os.getenv("LLM_RPM", 30))              # requests per minute
+LLM_TPM = float(os.getenv("LLM_TPM", 6000))            # tokens per minute
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", 0.5))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", 8))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", 20))  # per-attempt deadline
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to `per_minute` capacity.
+    Thread-safe, so one bucket is shared by every event loop in the process.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount):
+        """Takes `amount` if available; otherwise returns seconds to wait."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    async def acquire(self, amount):
+        while True:
+            wait = self.try_take(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta):
+        """Correct an estimate once the real usage is known (positive delta = consumed more)."""
+        with self._lock:
+            self.tokens -= delta
+
+    def block_for(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, groq.APIConnectionError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class LLMScheduler:
+    """
+    Client-side scheduling around Groq calls:
+    - global concurrency cap (per event loop),
+    - request-per-minute and token-per-minute buckets,
+    - retries with exponential backoff + full jitter, honouring retry-after,
+    - a per-attempt deadline that cancels hung requests.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, rpm=LLM_RPM, tpm=LLM_TPM,
+                 max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT_S):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._semaphore = loop_local(lambda: asyncio.Semaphore(max_concurrency))
+        self.stats = {"calls": 0, "retries": 0, "timeouts": 0, "rate_limited": 0, "gave_up": 0, "throttle_wait_s": 0.0}
+
+    def backoff_delay(self, attempt, error):
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * (2 ** attempt)))
+
+    async def run(self, call, estimated_tokens, timeout=None):
+        """
+        Runs `call` (a zero-arg coroutine factory) under the limits above.
+        Returns (result, reserved_tokens) so the caller can reconcile with real usage.
+        """
+        self.stats["calls"] += 1
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            throttle_start = time.monotonic()
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            async with self._semaphore():
+                self.stats["throttle_wait_s"] += time.monotonic() - throttle_start
+                try:
+                    return await asyncio.wait_for(call(), timeout), estimated_tokens
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.stats["timeouts"] += 1
+                    if _status_code(e) == 429:
+                        self.stats["rate_limited"] += 1
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        if is_retryable(e):
+                            self.stats["gave_up"] += 1
+                        raise
+                    delay = self.backoff_delay(attempt, e)
+                    error_name = type(e).__name__
+                    if _status_code(e) == 429:
+                        # Everyone waits out the server's rate limit, not just this call
+                        self.requests.block_for(delay)
+                        self.tokens.block_for(delay)
+
+            attempt += 1
+            self.stats["retries"] += 1
+            print(f"⚠️ LLM call failed ({error_name}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+# Local CPU models for the closed-label LLM classifiers (detect_intent,
+# interpret_user_confirmation, user_confirmation, classify_issue_intent).
+#
+# Every label the LLM gives is appended to CLASSIFIER_LABEL_LOG (JSON lines) when that
+# variable is set; train_classifiers.py turns the log into one TF-IDF + linear model per
+# classifier and writes them to LOCAL_CLASSIFIER_FILE, which is loaded at startup.
+# A classifier asks its model first and only calls the LLM when the model is missing or
+# its confidence is below LOCAL_CLASSIFIER_MIN_CONFIDENCE.
+
+LOCAL_CLASSIFIER_FILE = os.getenv(
+    "LOCAL_CLASSIFIER_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_classifiers.json"))
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", 0.9))
+CLASSIFIER_LABEL_LOG = os.getenv("CLASSIFIER_LABEL_LOG")
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def features(text):
+    """Word unigrams + bigrams; numbers collapse to <num> so IDs don't become features."""
+    words = ["<num>" if any(c.isdigit() for c in w) else w for w in _WORD.findall((text or "").lower())]
+    return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class TfidfLinearClassifier:
+    """Sublinear TF-IDF (L2-normalised) into a multinomial logistic regression."""
+
+    def __init__(self, labels, idf, weights, bias):
+        self.labels = labels
+        self.idf = idf            # feature -> idf
+        self.weights = weights    # feature -> [weight per label]
+        self.bias = bias          # [bias per label]
+
+    def vectorize(self, text):
+        vector = {f: (1 + math.log(count)) * self.idf[f] for f, count in features(text).items() if f in self.idf}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def _probabilities(self, vector):
+        scores = list(self.bias)
+        for f, v in vector.items():
+            for k, w in enumerate(self.weights[f]):
+                scores[k] += w * v
+        return _softmax(scores)
+
+    def predict(self, text):
+        """(label, probability)."""
+        probabilities = self._probabilities(self.vectorize(text))
+        best = max(range(len(self.labels)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    @classmethod
+    def train(cls, texts, labels, epochs=40, learning_rate=0.5, l2=1e-4, min_df=1, seed=0):
+        label_names = sorted(set(labels))
+        doc_freq = Counter(f for text in texts for f in features(text))
+        n_docs = len(texts)
+        idf = {f: math.log((1 + n_docs) / (1 + df)) + 1 for f, df in doc_freq.items() if df >= min_df}
+        model = cls(label_names, idf, {f: [0.0] * len(label_names) for f in idf}, [0.0] * len(label_names))
+
+        samples = [(model.vectorize(text), label_names.index(label)) for text, label in zip(texts, labels)]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + 0.1 * epoch)
+            for vector, target in samples:
+                probabilities = model._probabilities(vector)
+                for k, p in enumerate(probabilities):
+                    gradient = p - (k == target)
+                    model.bias[k] -= rate * gradient
+                    for f, v in vector.items():
+                        w = model.weights[f]
+                        w[k] -= rate * (gradient * v + l2 * w[k])
+        return model
+
+    def to_dict(self):
+        return {"labels": self.labels, "idf": self.idf, "weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["labels"], data["idf"], data["weights"], data["bias"])
+
+
+def save_models(models, path=LOCAL_CLASSIFIER_FILE, **info):
+    with open(path, "w") as f:
+        json.dump({"trained_at": datetime.now().isoformat(timespec="seconds"), **info,
+                   "models": {name: model.to_dict() for name, model in models.items()}}, f)
+
+
+def load_models(path=LOCAL_CLASSIFIER_FILE):
+    """{classifier: TfidfLinearClassifier}; empty when no model file was trained yet."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {name: TfidfLinearClassifier.from_dict(model) for name, model in data["models"].items()}
+
+
+class LocalClassifiers:
+    """The loaded models, the confidence gate, and how often they saved an LLM call."""
+
+    def __init__(self, models, min_confidence=LOCAL_CLASSIFIER_MIN_CONFIDENCE):
+        self.models = models
+        self.min_confidence = min_confidence
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"confident": 0, "deferred": 0, "total_us": 0.0})
+
+    def predict(self, classifier, text):
+        """The local label when the model is confident enough, else None (ask the LLM)."""
+        model = self.models.get(classifier) if self.enabled else None
+        if model is None:
+            return None
+        start = time.perf_counter()
+        label, confidence = model.predict(text)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        confident = confidence >= self.min_confidence
+        with self._lock:
+            row = self._stats[classifier]
+            row["confident" if confident else "deferred"] += 1
+            row["total_us"] += elapsed_us
+        return label if confident else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "min_confidence": self.min_confidence,
+                "classifiers": {
+                    name: {"confident": row["confident"], "deferred": row["deferred"],
+                           "avg_us": round(row["total_us"] / max(1, row["confident"] + row["deferred"]), 1)}
+                    for name, row in self._stats.items()
+                },
+            }
+
+
+local_classifiers = LocalClassifiers(load_models())
+
+
+class LabelLog:
+    """Appends (classifier, text, LLM label) rows to a JSON-lines file for training."""
+
+    def __init__(self, path=CLASSIFIER_LABEL_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, classifier, text, label, latency_ms):
+        if not self.path:
+            return
+        row = json.dumps({"classifier": classifier, "text": text, "label": label, "latency_ms": round(latency_ms, 1)})
+        with self._lock, open(self.path, "a") as f:
+            f.write(row + "\n")
+
+
+label_log = LabelLog()
+
+
+def read_label_log(path):
+    """{classifier: [(text, label, latency_ms)]}, keeping the latest label for repeated texts."""
+    rows = defaultdict(dict)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                rows[row["classifier"]][row["text"]] = (row["text"], row["label"], row.get("latency_ms"))
+    return {name: list(by_text.values()) for name, by_text in rows.items()}
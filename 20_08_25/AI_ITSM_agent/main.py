@@ -1,10 +1,26 @@
 # backend/main.py
 
+import asyncio
+import json
+import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from typing import List
 from pydantic import BaseModel
-from agent import run_itsm_agent, session_store
-from llm_interface import classify_issue_intent, ask_llm
+import llm_fallbacks
+import reply_stream
+from agent import run_itsm_agent_async, session_store
+from llm_interface import generate_intro_async, id_extraction_stats, response_cache, llm_scheduler, llm_breaker
+from intent_router import intent_router
+from intro_cache import intro_cache
+from local_classifier import local_classifiers
+from confirmation_rules import reply_parser_stats
+from llm_metrics import llm_metrics
+from turn_dag import stage_metrics
+from turn_memo import turn_memo_stats
+from conversation_state import transition_report
+from db_interface import get_pool_stats, known_failures_cache, reload_known_failures
 
 app = FastAPI()
 
@@ -17,47 +33,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def warm_caches():
+    # Load known_failures once and keep it fresh in the background
+    try:
+        known_failures_cache.reload()
+    except Exception as e:
+        print(f"[!] Could not preload known_failures, will load on first use: {e}")
+    known_failures_cache.start_refresher()
+    session_store.start_sweeper()
+    # Intros for every known agent type, generated in the background (low priority) and refreshed periodically
+    intro_cache.start_refresher()
+
+
 class ChatRequest(BaseModel):
     message: str
     session_id: str
 
 @app.post("/chat")
 async def chat_endpoint(chat: ChatRequest):
-    reply = run_itsm_agent(chat.message, chat.session_id)
+    reply = await run_itsm_agent_async(chat.message, chat.session_id)
     return {"response": reply}
 
+
+def _sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat: ChatRequest):
+    """
+    /chat over Server-Sent Events:
+      data: {"delta": "..."}                           reply text as it is produced
+      data: {"done": true, "response": "...", "replace": bool}
+      data: {"done": true, "error": "..."}             the turn failed (shown instead of the reply)
+    The final event carries the full reply; replace=true means the deltas diverged from
+    it and the client should show `response` instead. The session is only updated once
+    the turn completes; a client disconnect cancels the turn.
+    """
+    queue = asyncio.Queue()
+
+    async def run_turn():
+        with reply_stream.streaming(queue.put_nowait) as stream:
+            reply = await run_itsm_agent_async(chat.message, chat.session_id)
+        return reply, stream
+
+    async def events():
+        start = time.perf_counter()
+        first_byte_ms = None
+        turn = asyncio.create_task(run_turn())
+        try:
+            while True:
+                next_delta = asyncio.ensure_future(queue.get())
+                await asyncio.wait({next_delta, turn}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_delta.done():
+                    next_delta.cancel()
+                    break
+                if first_byte_ms is None:
+                    first_byte_ms = (time.perf_counter() - start) * 1000
+                yield _sse({"delta": next_delta.result()})
+            while not queue.empty():
+                yield _sse({"delta": queue.get_nowait()})
+
+            try:
+                reply, stream = turn.result()
+            except Exception as e:
+                # The 200 headers are already out: end the stream with an error event instead
+                print(f"[!] Streamed chat turn failed for session {chat.session_id}: {e!r}")
+                yield _sse({"done": True, "error": "Sorry, something went wrong while handling your message. Please try again."})
+                return
+            rest = stream.remainder(reply)
+            if rest:
+                if first_byte_ms is None:
+                    first_byte_ms = (time.perf_counter() - start) * 1000
+                yield _sse({"delta": rest})
+            yield _sse({"done": True, "response": reply, "replace": rest is None})
+            llm_metrics.record_reply_stream(first_byte_ms or 0.0, (time.perf_counter() - start) * 1000)
+        finally:
+            if not turn.done():
+                turn.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/end_chat")
 async def end_chat(request: Request):
     body = await request.json()
     session_id = body.get("session_id")
-    if session_id and session_id in session_store:
-        del session_store[session_id]
+    if session_id:
+        await session_store.delete(session_id)
     return {"status": "chat ended"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "db_pool": get_pool_stats(),
+        "sessions": session_store.info(),
+        "known_failures": known_failures_cache.info(),
+        "id_extraction": id_extraction_stats,
+        "llm_response_cache": response_cache.stats(),
+        "llm": llm_metrics.snapshot(),
+        "llm_scheduler": llm_scheduler.stats,
+        "llm_breaker": llm_breaker.snapshot(),
+        "turn_stages": stage_metrics.snapshot(),
+        "transitions": transition_report.snapshot(),
+        "turn_memo": turn_memo_stats.snapshot(),
+        "local_classifiers": local_classifiers.snapshot(),
+        "confirmation_fast_path": reply_parser_stats.snapshot(),
+        "intent_router": intent_router.snapshot(),
+        "intros": intro_cache.info(),
+    }
+
+
+@app.post("/admin/reload_known_failures")
+async def reload_known_failures_endpoint():
+    # CHECKSUM + SELECTs: off the event loop so chats in flight aren't stalled
+    snapshot = await asyncio.to_thread(reload_known_failures)
+    return {"status": "reloaded", "patterns": len(snapshot.rows), "version": snapshot.version}
+
+
 class MessageInput(BaseModel):
     message: str
 
 @app.post("/classify_intent")
-def classify_intent(input: MessageInput):
+async def classify_intent(input: MessageInput):
     message = input.message
-    agent_type = classify_issue_intent(message)  # e.g., returns 'itsm', 'location', etc.
+    agent_type = await intent_router.route(message)  # e.g., returns 'pack_itsm', 'location', etc.
     return {"agent_type": agent_type}
 
+class MessagesInput(BaseModel):
+    messages: List[str]
+
+@app.post("/classify_intent/batch")
+async def classify_intent_batch(input: MessagesInput):
+    """Routes many messages in one request; agent_types are in the order of messages."""
+    return {"agent_types": await intent_router.route_many(input.messages)}
+
 class AgentTypeRequest(BaseModel):
     agent_type: str
 
 @app.post("/generate_intro")
 async def generate_intro(req: AgentTypeRequest):
-    agent_name = req.agent_type.replace("_", " ").title()
-    prompt = f"""
-You are acting as the "{agent_name}" helpful support assistant.
-
-Introduce yourself clearly by saying something like "Hi, I'm your {agent_name} Agent" or similar. Be friendly and speak in helpful tone.
-
-Then politely ask the user to describe their issue. Do NOT ask for IDs, codes, or technical details — just prompt them to explain the issue.
-
-Respond in a single, human-friendly sentence or two.
-"""
-    response = ask_llm(prompt)
-    return {"intro_message": response.strip()}    
+    # Known agent types are served from the precomputed pool; others are generated live
+    intro = intro_cache.get(req.agent_type)
+    if intro is None:
+        if req.agent_type in intro_cache.agent_types:
+            # Not generated yet, or the LLM is failing: the template now rather than a live call that waits
+            intro = llm_fallbacks.agent_intro(req.agent_type.replace("_", " ").title())
+        else:
+            intro = await generate_intro_async(req.agent_type)
+    return {"intro_message": intro}    
@@ -0,0 +1,304 @@
+# Local stand-in for a Redis server, for multi-worker tests and offline CI.
+#
+#   python redis_stub_server.py --port 6390 --latency-ms 1
+#   SESSION_STORE_URL=redis://localhost:6390/0 uvicorn main:app --workers 4
+#
+# Speaks RESP2 and RESP3 (HELLO 3, which redis-py negotiates) and implements the commands
+# the session store uses: GET / SET (NX, XX, EX, PX), DEL, EXISTS, (P)EXPIRE, (P)TTL,
+# WATCH / MULTI / EXEC / DISCARD / UNWATCH, plus PING, SELECT, CLIENT, DBSIZE, FLUSHALL,
+# KEYS. Single database, data in memory only.
+
+import argparse
+import asyncio
+import fnmatch
+import time
+
+STUB_CONFIG = {"latency_ms": 0.0}
+
+
+class _Nil:
+    pass
+
+
+NIL = _Nil()            # $-1
+NIL_ARRAY = object()    # *-1 (aborted EXEC)
+
+
+class RespError(Exception):
+    pass
+
+
+class _Ok(str):
+    pass
+
+
+OK = _Ok("OK")
+QUEUED = _Ok("QUEUED")
+
+
+class Store:
+    def __init__(self):
+        self.values = {}     # key -> bytes
+        self.expires = {}    # key -> monotonic deadline
+        self.versions = {}   # key -> change counter, for WATCH
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            del self.values[key]
+            del self.expires[key]
+            self._touch(key)
+        return key in self.values
+
+    def version(self, key):
+        self._alive(key)
+        return self.versions.get(key, 0)
+
+    def get(self, key):
+        return self.values[key] if self._alive(key) else NIL
+
+    def set(self, key, value, nx=False, xx=False, ttl_ms=None):
+        exists = self._alive(key)
+        if (nx and exists) or (xx and not exists):
+            return NIL
+        self.values[key] = value
+        if ttl_ms is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl_ms / 1000
+        self._touch(key)
+        return OK
+
+    def delete(self, keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.values[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+                removed += 1
+        return removed
+
+    def expire(self, key, ttl_ms):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + ttl_ms / 1000
+        self._touch(key)
+        return 1
+
+    def ttl_ms(self, key):
+        if not self._alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else max(0, int((deadline - time.monotonic()) * 1000))
+
+    def keys(self, pattern):
+        return [k for k in list(self.values) if self._alive(k) and fnmatch.fnmatchcase(k.decode(), pattern)]
+
+    def flush(self):
+        for key in list(self.values):
+            self._touch(key)
+        self.values.clear()
+        self.expires.clear()
+
+
+store = Store()
+
+
+def _int(arg):
+    try:
+        return int(arg)
+    except ValueError:
+        raise RespError("ERR value is not an integer or out of range")
+
+
+def _set(args):
+    if len(args) < 2:
+        raise RespError("ERR wrong number of arguments for 'set' command")
+    key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+    nx, xx, ttl_ms, i = False, False, None, 0
+    while i < len(options):
+        option = options[i]
+        if option == b"NX":
+            nx = True
+        elif option == b"XX":
+            xx = True
+        elif option in (b"EX", b"PX") and i + 1 < len(options):
+            ttl_ms = _int(args[2 + i + 1]) * (1000 if option == b"EX" else 1)
+            i += 1
+        else:
+            raise RespError("ERR syntax error")
+        i += 1
+    return store.set(key, value, nx=nx, xx=xx, ttl_ms=ttl_ms)
+
+
+def _ttl(args, scale):
+    ms = store.ttl_ms(args[0])
+    return ms if ms < 0 else ms // scale
+
+
+COMMANDS = {
+    b"PING": lambda args: args[0] if args else _Ok("PONG"),
+    b"ECHO": lambda args: args[0],
+    b"SELECT": lambda args: OK,
+    b"CLIENT": lambda args: OK,
+    b"GET": lambda args: store.get(args[0]),
+    b"SET": _set,
+    b"DEL": lambda args: store.delete(args),
+    b"UNLINK": lambda args: store.delete(args),
+    b"EXISTS": lambda args: sum(store.get(k) is not NIL for k in args),
+    b"EXPIRE": lambda args: store.expire(args[0], _int(args[1]) * 1000),
+    b"PEXPIRE": lambda args: store.expire(args[0], _int(args[1])),
+    b"TTL": lambda args: _ttl(args, 1000),
+    b"PTTL": lambda args: _ttl(args, 1),
+    b"KEYS": lambda args: store.keys(args[0].decode()),
+    b"DBSIZE": lambda args: len(store.keys("*")),
+    b"FLUSHALL": lambda args: store.flush() or OK,
+    b"FLUSHDB": lambda args: store.flush() or OK,
+}
+
+
+def encode(value, resp3=False):
+    if value is NIL or value is NIL_ARRAY:
+        return b"_\r\n" if resp3 else b"$-1\r\n" if value is NIL else b"*-1\r\n"
+    if isinstance(value, RespError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, _Ok):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bool) or isinstance(value, int):
+        return b":" + str(int(value)).encode() + b"\r\n"
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+    if isinstance(value, (list, tuple)):
+        return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(encode(v, resp3) for v in value)
+    if isinstance(value, dict):
+        if not resp3:
+            return encode([item for pair in value.items() for item in pair])
+        return b"%" + str(len(value)).encode() + b"\r\n" + b"".join(
+            encode(k, resp3) + encode(v, resp3) for k, v in value.items())
+    raise TypeError(f"can't encode {value!r}")
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+class Connection:
+    """Per-client WATCH / MULTI state."""
+
+    def __init__(self):
+        self.watched = {}
+        self.queued = None
+        self.resp3 = False
+
+    def run(self, name, args):
+        if name == b"HELLO":
+            version = _int(args[0]) if args else 2
+            if version not in (2, 3):
+                raise RespError("NOPROTO unsupported protocol version")
+            self.resp3 = version == 3
+            return {"server": "redis", "version": "7.2.0", "proto": version, "id": id(self), "mode": "standalone",
+                    "role": "master", "modules": []}
+        if name == b"MULTI":
+            if self.queued is not None:
+                raise RespError("ERR MULTI calls can not be nested")
+            self.queued = []
+            return OK
+        if name == b"DISCARD":
+            if self.queued is None:
+                raise RespError("ERR DISCARD without MULTI")
+            self.queued, self.watched = None, {}
+            return OK
+        if name == b"EXEC":
+            if self.queued is None:
+                raise RespError("ERR EXEC without MULTI")
+            queued, watched = self.queued, self.watched
+            self.queued, self.watched = None, {}
+            if any(store.version(key) != version for key, version in watched.items()):
+                return NIL_ARRAY
+            return [self._call(n, a) for n, a in queued]
+        if name == b"WATCH":
+            if self.queued is not None:
+                raise RespError("ERR WATCH inside MULTI is not allowed")
+            for key in args:
+                self.watched.setdefault(key, store.version(key))
+            return OK
+        if name == b"UNWATCH":
+            self.watched = {}
+            return OK
+        if self.queued is not None:
+            if name not in COMMANDS:
+                raise RespError(f"ERR unknown command '{name.decode()}'")
+            self.queued.append((name, args))
+            return QUEUED
+        return self._call(name, args)
+
+    @staticmethod
+    def _call(name, args):
+        handler = COMMANDS.get(name)
+        if handler is None:
+            return RespError(f"ERR unknown command '{name.decode()}'")
+        try:
+            return handler(args)
+        except RespError as e:
+            return e
+        except IndexError:
+            return RespError(f"ERR wrong number of arguments for '{name.decode().lower()}' command")
+
+
+async def handle_client(reader, writer):
+    connection = Connection()
+    try:
+        while True:
+            command = await read_command(reader)
+            if command is None:
+                break
+            if not command:
+                continue
+            name, args = command[0].upper(), command[1:]
+            if name == b"QUIT":
+                writer.write(encode(OK))
+                break
+            if STUB_CONFIG["latency_ms"]:
+                await asyncio.sleep(STUB_CONFIG["latency_ms"] / 1000)
+            try:
+                reply = connection.run(name, args)
+            except RespError as e:
+                reply = e
+            writer.write(encode(reply, connection.resp3))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_client, host, port)
+    print(f"redis stub listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Redis stand-in (RESP2, in-memory)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every command")
+    args = parser.parse_args()
+    STUB_CONFIG["latency_ms"] = args.latency_ms
+    asyncio.run(serve(args.host, args.port))
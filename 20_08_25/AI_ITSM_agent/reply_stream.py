@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Live delivery of a turn's reply while it is being produced (SSE endpoint, CLI).
+#
+# Inside `streaming(on_text)`, user-visible LLM call sites stream their tokens here
+# (profile "stream": true) and handlers emit their fixed text in reply order. Callers
+# still get the complete reply from run_itsm_agent_async; `remainder()` tells them
+# what wasn't streamed yet.
+
+_current: ContextVar = ContextVar("reply_stream", default=None)
+
+
+class ReplyStream:
+    def __init__(self, on_text):
+        self._on_text = on_text
+        self._parts = []
+
+    def emit(self, text):
+        if text:
+            self._parts.append(text)
+            self._on_text(text)
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def remainder(self, reply):
+        """
+        The part of the final reply not streamed yet: "" if everything went out,
+        the missing tail if the stream is a prefix of the reply, and None if the
+        stream diverged (e.g. a retried call re-sent tokens) and should be replaced.
+        """
+        streamed = self.text
+        if reply == streamed:
+            return ""
+        if reply.startswith(streamed):
+            return reply[len(streamed):]
+        return None
+
+
+@contextmanager
+def streaming(on_text):
+    stream = ReplyStream(on_text)
+    token = _current.set(stream)
+    try:
+        yield stream
+    finally:
+        _current.reset(token)
+
+
+def active():
+    return _current.get() is not None
+
+
+def emit(text):
+    """Sends reply text to the live stream, if any. No-op outside streaming()."""
+    stream = _current.get()
+    if stream is not None:
+        stream.emit(text)
@@ -0,0 +1,66 @@
+import json
+
+import msgpack
+
+from conversation_state import IDLE
+
+# What a conversation remembers between turns, and how it is stored.
+#
+# Stored as a msgpack array in field order, version first:
+#   [1, "awaiting_workaround_confirmation", "ORD123", None, "INC42", "In Progress", ...]
+# Adding a field: append it to _FIELDS with its default and bump SESSION_SCHEMA_VERSION;
+# records written by an older version are read with the missing fields at their defaults.
+
+SESSION_SCHEMA_VERSION = 1
+
+_FIELDS = (
+    ("state", IDLE),                       # conversation_state: what the agent is waiting for
+    ("order_id", None),
+    ("container_id", None),
+    ("incident_id", None),
+    ("status", None),                      # incident status set by this conversation
+    ("last_intent", None),                 # carried forward when a message only has IDs
+    ("last_user_message", None),
+    ("incident_choices", None),            # incident IDs offered in AWAITING_INCIDENT_CHOICE
+    ("last_summary_incident_id", None),
+)
+_NAMES = tuple(name for name, _ in _FIELDS)
+
+
+class SessionState:
+    """
+    One conversation's state, fixed schema. `last_transition` is set by
+    conversation_state.transition() for the turn's metrics and never stored.
+    """
+
+    __slots__ = _NAMES + ("last_transition",)
+
+    def __init__(self, **values):
+        for name, default in _FIELDS:
+            setattr(self, name, values.pop(name, default))
+        self.last_transition = None
+        if values:
+            raise TypeError(f"Unknown session fields: {', '.join(values)}")
+
+    def to_bytes(self):
+        return msgpack.packb([SESSION_SCHEMA_VERSION, *(getattr(self, name) for name in _NAMES)])
+
+    @classmethod
+    def from_bytes(cls, raw):
+        if raw[:1] == b"{":
+            # JSON dict written before the typed record: keep the fields it knows
+            legacy = json.loads(raw)
+            return cls(**{name: legacy.get(name) for name in _NAMES if legacy.get(name) is not None})
+        version, *values = msgpack.unpackb(raw)
+        if version > SESSION_SCHEMA_VERSION:
+            raise ValueError(f"Session record version {version} is newer than this code ({SESSION_SCHEMA_VERSION})")
+        return cls(**dict(zip(_NAMES, values)))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in _NAMES}
+
+    def __eq__(self, other):
+        return isinstance(other, SessionState) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return f"SessionState({', '.join(f'{k}={v!r}' for k, v in self.as_dict().items() if v is not None)})"
@@ -0,0 +1,323 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+from async_utils import loop_local
+from session_record import SessionState
+
+load_dotenv()
+
+# Where conversation state lives between turns.
+#
+#   SESSION_STORE_URL unset       -> InMemorySessionStore (one process only)
+#   SESSION_STORE_URL=redis://... -> RedisSessionStore, shared by every worker / replica
+#
+# Both give an exclusive read-modify-write per session:
+#
+#   async with session_store.transaction(session_id) as session:
+#       state = session.state            # a SessionState, None for a new session
+#       ...
+#       session.state = new_state        # saved when the block exits without error
+#
+# Each load decodes a fresh SessionState, so changing `session.state` in place is saved
+# too, and a turn that fails leaves the stored session as it was. Both stores keep the
+# record's msgpack bytes (session_record.py), not Python objects.
+#
+# Turns for one session run one at a time (across processes with Redis); different
+# sessions don't wait for each other. delete() (/end_chat) takes the same lock, so a
+# turn still in flight can't save the session back after it. Sessions idle for SESSION_IDLE_TTL_S are dropped
+# (closed tabs, CLI runs); in memory the store is also capped by count and bytes.
+
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL")
+SESSION_KEY_PREFIX = os.getenv("SESSION_KEY_PREFIX", "itsm:")
+SESSION_LOCK_TTL_S = float(os.getenv("SESSION_LOCK_TTL_S", 30))    # renewed while the turn runs
+SESSION_LOCK_WAIT_S = float(os.getenv("SESSION_LOCK_WAIT_S", 30))
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", 1800))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", 10000))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("SESSION_SWEEP_INTERVAL_S", 60))
+
+
+class SessionBusyError(Exception):
+    """Another turn held the session for longer than SESSION_LOCK_WAIT_S."""
+
+
+class SessionLockLost(Exception):
+    """The session lock expired mid-turn and someone else took it; the turn's state was not saved."""
+
+
+class _Transaction:
+    __slots__ = ("state",)
+
+    def __init__(self, raw):
+        self.state = SessionState.from_bytes(raw) if raw is not None else None
+
+
+class _Entry:
+    __slots__ = ("raw", "last_used")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = time.monotonic()
+
+
+class InMemorySessionStore:
+    """
+    Sessions in this process, least recently used first.
+    - A session idle for longer than `idle_ttl` is gone (expired on access, and removed
+      by a background sweeper every `sweep_interval` seconds).
+    - Beyond `max_count` sessions or `max_bytes` of serialized state, the least
+      recently used sessions are evicted.
+    """
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL_S, max_count=SESSION_MAX_COUNT, max_bytes=SESSION_MAX_BYTES,
+                 sweep_interval=SESSION_SWEEP_INTERVAL_S):
+        self.idle_ttl = idle_ttl
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()    # session_id -> _Entry
+        self._bytes = 0
+        self._lock = threading.Lock()    # the sweeper runs in its own thread
+        self._locks = loop_local(dict)   # session_id -> [asyncio.Lock, users] (per event loop)
+        self._sweeper = None
+        self.stats = {"transactions": 0, "lock_waits": 0, "expired": 0, "evicted_count": 0, "evicted_bytes": 0,
+                      "sweeps": 0}
+
+    def _remove(self, session_id):
+        entry = self._entries.pop(session_id)
+        self._bytes -= len(entry.raw)
+
+    def _expired(self, entry, now):
+        return now - entry.last_used > self.idle_ttl
+
+    def _load(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                self._remove(session_id)
+                self.stats["expired"] += 1
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(session_id)
+            return entry.raw
+
+    def _save(self, session_id, raw):
+        entry = _Entry(raw)
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = entry
+            self._bytes += len(raw)
+            while len(self._entries) > 1 and (len(self._entries) > self.max_count or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self.stats["evicted_count" if len(self._entries) > self.max_count else "evicted_bytes"] += 1
+                self._remove(oldest)
+
+    @asynccontextmanager
+    async def _locked(self, session_id):
+        locks = self._locks()
+        entry = locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            if entry[0].locked():
+                self.stats["lock_waits"] += 1
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del locks[session_id]
+
+    @asynccontextmanager
+    async def transaction(self, session_id):
+        async with self._locked(session_id):
+            txn = _Transaction(self._load(session_id))
+            yield txn
+            if txn.state is not None:
+                self._save(session_id, txn.state.to_bytes())
+            self.stats["transactions"] += 1
+
+    async def delete(self, session_id):
+        async with self._locked(session_id):
+            with self._lock:
+                if session_id in self._entries:
+                    self._remove(session_id)
+
+    async def exists(self, session_id):
+        return self._load(session_id) is not None
+
+    def sweep(self):
+        """Removes every expired session; returns how many."""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            # Least recently used first: stop at the first session still alive
+            for session_id, entry in list(self._entries.items()):
+                if not self._expired(entry, now):
+                    break
+                self._remove(session_id)
+                removed += 1
+            self.stats["expired"] += removed
+            self.stats["sweeps"] += 1
+        return removed
+
+    def start_sweeper(self):
+        if self._sweeper is not None:
+            return
+
+        def _loop():
+            while True:
+                time.sleep(self.sweep_interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"[!] session sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def info(self):
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._entries), "bytes": self._bytes, **self.stats}
+
+
+class RedisSessionStore:
+    """
+    Sessions as msgpack records under {prefix}session:{id}, guarded by a per-session lock
+    key ({prefix}lock:{id}, SET NX PX with a random token). The holder renews the lock
+    every lock_ttl / 3 while its turn runs (LLM calls with retries can take longer than
+    any fixed TTL), so the TTL only matters when a worker dies holding it. The save only
+    happens while this turn still holds the lock (WATCH/MULTI on the lock key), so a
+    turn whose lock was lost anyway can't overwrite a newer turn's state. Each save renews the key's idle TTL;
+    count / memory limits are the Redis server's (maxmemory + an LRU eviction policy).
+    """
+
+    def __init__(self, url, prefix=SESSION_KEY_PREFIX, lock_ttl=SESSION_LOCK_TTL_S, lock_wait=SESSION_LOCK_WAIT_S,
+                 idle_ttl=SESSION_IDLE_TTL_S):
+        import redis.asyncio as redis  # only needed for this backend
+
+        self.url = url
+        self.prefix = prefix
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self.lock_wait = lock_wait
+        self.idle_ttl_ms = int(idle_ttl * 1000)
+        self._client = loop_local(lambda: redis.Redis.from_url(url))
+        self._watch_error = redis.WatchError
+        self._lock = threading.Lock()
+        self.stats = {"transactions": 0, "lock_waits": 0, "lock_timeouts": 0, "lock_renewals": 0, "locks_lost": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _keys(self, session_id):
+        return f"{self.prefix}session:{session_id}", f"{self.prefix}lock:{session_id}"
+
+    async def _acquire(self, client, lock_key, token):
+        deadline = asyncio.get_running_loop().time() + self.lock_wait
+        delay = 0.01
+        waited = False
+        while not await client.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+            if not waited:
+                waited = True
+                self._count("lock_waits")
+            if asyncio.get_running_loop().time() >= deadline:
+                self._count("lock_timeouts")
+                raise SessionBusyError(f"session lock {lock_key} busy for {self.lock_wait}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+    async def _while_locked(self, client, lock_key, token, commands):
+        """Runs `commands(pipe)` in MULTI/EXEC only if `token` still holds the lock; False otherwise."""
+        async with client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(lock_key)
+                holder = await pipe.get(lock_key)
+                if holder is None or holder.decode() != token:
+                    return False
+                pipe.multi()
+                commands(pipe)
+                await pipe.execute()
+                return True
+            except self._watch_error:
+                return False
+
+    async def _renew(self, run_locked, lock_key):
+        while True:
+            await asyncio.sleep(self.lock_ttl_ms / 3000)
+            try:
+                renewed = await run_locked(lambda pipe: pipe.pexpire(lock_key, self.lock_ttl_ms))
+            except Exception as e:
+                print(f"[!] session lock renewal failed for {lock_key}: {e}")
+                continue  # try again before the TTL runs out
+            if not renewed:
+                return  # lost: the save will notice
+            self._count("lock_renewals")
+
+    @asynccontextmanager
+    async def _locked(self, session_id):
+        """
+        Holds the session lock, renewed in the background, for the block. Yields
+        (client, run_locked): run_locked(commands) is _while_locked for this hold.
+        """
+        client = self._client()
+        lock_key = self._keys(session_id)[1]
+        token = uuid.uuid4().hex
+        await self._acquire(client, lock_key, token)
+        # A renewal touches the WATCHed lock key: one command at a time, or it aborts a save
+        guard = asyncio.Lock()
+
+        async def run_locked(commands):
+            async with guard:
+                return await self._while_locked(client, lock_key, token, commands)
+
+        renewer = asyncio.create_task(self._renew(run_locked, lock_key))
+        try:
+            yield client, run_locked
+        finally:
+            renewer.cancel()
+            # Release only our own lock (it may have expired and been taken by another turn)
+            await asyncio.shield(run_locked(lambda pipe: pipe.delete(lock_key)))
+
+    @asynccontextmanager
+    async def transaction(self, session_id):
+        session_key = self._keys(session_id)[0]
+        async with self._locked(session_id) as (client, run_locked):
+            txn = _Transaction(await client.get(session_key))
+            yield txn
+            if txn.state is not None:
+                record = txn.state.to_bytes()
+                saved = await run_locked(lambda pipe: pipe.set(session_key, record, px=self.idle_ttl_ms))
+                if not saved:
+                    self._count("locks_lost")
+                    raise SessionLockLost(f"lost the lock on {session_key} before saving")
+            self._count("transactions")
+
+    async def delete(self, session_id):
+        session_key = self._keys(session_id)[0]
+        async with self._locked(session_id) as (_, run_locked):
+            await run_locked(lambda pipe: pipe.delete(session_key))
+
+    async def exists(self, session_id):
+        return bool(await self._client().exists(self._keys(session_id)[0]))
+
+    def start_sweeper(self):
+        pass  # Redis expires idle sessions itself
+
+    def info(self):
+        with self._lock:
+            return {"backend": "redis", **self.stats}
+
+
+def make_session_store(url=SESSION_STORE_URL):
+    if url:
+        return RedisSessionStore(url)
+    return InMemorySessionStore()
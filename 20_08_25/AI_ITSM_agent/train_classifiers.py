@@ -0,0 +1,101 @@
+# Trains the local classifiers (local_classifier.py) from the LLM labels logged in
+# CLASSIFIER_LABEL_LOG, and benchmarks them against those labels.
+#
+#   CLASSIFIER_LABEL_LOG=classifier_labels.jsonl uvicorn main:app ...     (collect labels)
+#   python train_classifiers.py --log classifier_labels.jsonl             (train + benchmark)
+#   python train_classifiers.py --log newer_labels.jsonl --evaluate       (benchmark the saved models only)
+#
+# Each classifier is scored on a held-out split: accuracy on all texts, the share the model
+# would answer itself at the confidence threshold and its accuracy there, and local vs LLM
+# latency. The saved model is then retrained on every example. Restart the API to load it.
+
+import argparse
+import random
+import statistics
+import time
+
+from local_classifier import (LOCAL_CLASSIFIER_FILE, LOCAL_CLASSIFIER_MIN_CONFIDENCE, TfidfLinearClassifier,
+                              load_models, read_label_log, save_models)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def evaluate(model, examples, min_confidence):
+    correct = confident = confident_correct = 0
+    local_us = []
+    for text, label, _ in examples:
+        start = time.perf_counter()
+        predicted, confidence = model.predict(text)
+        local_us.append((time.perf_counter() - start) * 1e6)
+        correct += predicted == label
+        if confidence >= min_confidence:
+            confident += 1
+            confident_correct += predicted == label
+    llm_ms = [latency for _, _, latency in examples if latency is not None]
+    return {
+        "examples": len(examples),
+        "accuracy": correct / len(examples),
+        "coverage": confident / len(examples),
+        "confident_accuracy": confident_correct / confident if confident else None,
+        "local_p50_us": _percentile(local_us, 0.5),
+        "local_p99_us": _percentile(local_us, 0.99),
+        "llm_p50_ms": statistics.median(llm_ms) if llm_ms else None,
+    }
+
+
+def split(examples, holdout, seed=0):
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    cut = int(len(examples) * (1 - holdout))
+    return examples[:cut], examples[cut:]
+
+
+def train(labelled, holdout, min_examples, min_confidence):
+    models, results = {}, {}
+    for classifier, examples in sorted(labelled.items()):
+        if len(examples) < min_examples or len({label for _, label, _ in examples}) < 2:
+            print(f"skipping {classifier}: {len(examples)} examples (need {min_examples}, 2+ labels)")
+            continue
+        train_set, test_set = split(examples, holdout)
+        model = TfidfLinearClassifier.train([t for t, _, _ in train_set], [l for _, l, _ in train_set])
+        results[classifier] = evaluate(model, test_set, min_confidence)
+        models[classifier] = TfidfLinearClassifier.train([t for t, _, _ in examples], [l for _, l, _ in examples])
+    return models, results
+
+
+def _fmt(value, pattern):
+    return "-" if value is None else pattern.format(value)
+
+
+def print_results(results, min_confidence):
+    print(f"\nconfidence threshold {min_confidence}")
+    print(f"{'classifier':<30}{'n':>6}{'acc':>8}{'cover':>8}{'acc@conf':>10}{'p50 us':>9}{'p99 us':>9}{'LLM p50 ms':>12}")
+    for classifier, r in results.items():
+        print(f"{classifier:<30}{r['examples']:>6}{r['accuracy']:>8.1%}{r['coverage']:>8.1%}"
+              f"{_fmt(r['confident_accuracy'], '{:.1%}'):>10}{r['local_p50_us']:>9.1f}{r['local_p99_us']:>9.1f}"
+              f"{_fmt(r['llm_p50_ms'], '{:.0f}'):>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train / benchmark the local intent and confirmation classifiers")
+    parser.add_argument("--log", required=True, help="JSON-lines label log (CLASSIFIER_LABEL_LOG)")
+    parser.add_argument("--out", default=LOCAL_CLASSIFIER_FILE, help="model file to write / evaluate")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of examples held out for the benchmark")
+    parser.add_argument("--min-examples", type=int, default=30, help="fewer labels than this: no model")
+    parser.add_argument("--min-confidence", type=float, default=LOCAL_CLASSIFIER_MIN_CONFIDENCE)
+    parser.add_argument("--evaluate", action="store_true", help="only benchmark the saved models on --log")
+    args = parser.parse_args()
+
+    labelled = read_label_log(args.log)
+    if args.evaluate:
+        models = load_models(args.out)
+        results = {name: evaluate(model, labelled[name], args.min_confidence)
+                   for name, model in models.items() if labelled.get(name)}
+    else:
+        models, results = train(labelled, args.holdout, args.min_examples, args.min_confidence)
+        save_models(models, args.out, examples={name: len(labelled[name]) for name in models})
+        print(f"saved {len(models)} model(s) to {args.out}")
+    print_results(results, args.min_confidence)
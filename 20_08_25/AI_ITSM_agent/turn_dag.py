@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from llm_metrics import Histogram, LATENCY_BUCKETS_MS, TURN_DEBUG
+
+
+class StageMetrics:
+    """Duration histogram per turn stage, plus how often speculative stages were used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: Histogram(LATENCY_BUCKETS_MS))
+        self._speculation = defaultdict(lambda: {"used": 0, "wasted": 0})
+
+    def record(self, stage, duration_ms, speculative, used):
+        with self._lock:
+            self._durations[stage].observe(duration_ms)
+            if speculative:
+                self._speculation[stage]["used" if used else "wasted"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "duration_ms": {stage: h.snapshot() for stage, h in self._durations.items()},
+                "speculation": {stage: dict(counts) for stage, counts in self._speculation.items()},
+            }
+
+
+stage_metrics = StageMetrics()
+
+
+class _Stage:
+    __slots__ = ("name", "task", "speculative", "used", "children", "started_ms", "duration_ms")
+
+    def __init__(self, name, speculative):
+        self.name = name
+        self.speculative = speculative
+        self.used = not speculative
+        self.children = []
+        self.started_ms = None
+        self.duration_ms = None
+
+    def claim(self):
+        """Marks the stage (and everything it asked for) as needed by the turn."""
+        if not self.used:
+            self.used = True
+            for child in self.children:
+                child.claim()
+
+
+# Stage whose code is running in the current task (so nested run() calls know their parent)
+_current_stage: ContextVar = ContextVar("turn_dag_stage", default=None)
+
+
+class TurnDAG:
+    """
+    Runs the stages of one turn as tasks, so stages that don't depend on each other
+    overlap. A stage that needs another one simply awaits it; the graph is whatever
+    those awaits form.
+
+    run() starts a stage, or returns the already started one when the same stage was
+    requested with the same arguments (so a lookup started early is reused, and a
+    lookup for different IDs runs afresh). speculative=True marks work started before
+    it is known to be needed: close() cancels it if nothing asked for it, and waits
+    for every other stage (writes included) so the turn never ends with work in flight.
+    Stages started from inside a speculative stage are speculative too, and are claimed
+    along with it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._stages = {}
+        self._start = time.perf_counter()
+
+    def run(self, stage, fn, *args, blocking=False, speculative=False, **kwargs):
+        """
+        Starts fn(*args, **kwargs) as `stage` and returns an awaitable for its result.
+        blocking=True runs a sync function (DB, SMTP) in a worker thread.
+        """
+        parent = _current_stage.get()
+        if parent is not None and not parent.used:
+            speculative = True
+        key = (stage, args, tuple(sorted(kwargs.items())))
+        record = self._stages.get(key)
+        if record is None:
+            record = self._start_stage(stage, fn, args, kwargs, blocking, speculative)
+            self._stages[key] = record
+        if parent is not None:
+            parent.children.append(record)
+        if not speculative:
+            record.claim()
+        # Shielded: a cancelled consumer must not cancel a stage others may still need
+        result = asyncio.shield(record.task)
+        # Callers may ignore it (speculative starts); close() reports stage errors instead
+        result.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return result
+
+    def _start_stage(self, stage, fn, args, kwargs, blocking, speculative):
+        record = _Stage(stage, speculative)
+
+        async def _run():
+            _current_stage.set(record)
+            record.started_ms = (time.perf_counter() - self._start) * 1000
+            try:
+                if blocking:
+                    return await asyncio.to_thread(fn, *args, **kwargs)
+                return await fn(*args, **kwargs)
+            finally:
+                record.duration_ms = (time.perf_counter() - self._start) * 1000 - record.started_ms
+
+        record.task = asyncio.ensure_future(_run())
+        return record
+
+    async def close(self):
+        needed = []
+        for record in self._stages.values():
+            if record.used:
+                needed.append(record.task)
+            elif not record.task.done():
+                record.task.cancel()
+        try:
+            await asyncio.gather(*needed)
+        finally:
+            # Unused speculative stages: collect their outcome so errors aren't reported as unhandled
+            await asyncio.gather(*(r.task for r in self._stages.values() if not r.used), return_exceptions=True)
+            self._report()
+
+    def timings(self):
+        """[(stage, started_ms, duration_ms, speculative, used)] in start order."""
+        records = sorted(self._stages.values(), key=lambda r: r.started_ms if r.started_ms is not None else 0.0)
+        return [(r.name, r.started_ms, r.duration_ms, r.speculative, r.used) for r in records]
+
+    def _report(self):
+        parts = []
+        for name, started_ms, duration_ms, speculative, used in self.timings():
+            if duration_ms is None:
+                continue  # cancelled before it started
+            stage_metrics.record(name, duration_ms, speculative, used)
+            tag = "" if not speculative else " (spec)" if used else " (spec, unused)"
+            parts.append(f"{name}={started_ms:.0f}+{duration_ms:.0f}ms{tag}")
+        if TURN_DEBUG:
+            total_ms = (time.perf_counter() - self._start) * 1000
+            print(f"[STAGES] {self.name} total={total_ms:.0f}ms " + " ".join(parts))
@@ -0,0 +1,150 @@
+import asyncio
+import copy
+import functools
+import inspect
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from llm_metrics import TURN_DEBUG
+
+# Request-scoped memoization: inside turn_scope(), calls to @turn_memoized functions
+# with the same arguments run once per turn; the memo is dropped when the turn ends.
+# Only for lookups whose answer can't change within a turn (classifiers at temperature 0,
+# DB reads). Writes call invalidate() so reads after them hit the database again.
+# Callers always get their own copy of the result, so mutating it is safe.
+
+_current: ContextVar = ContextVar("turn_memo", default=None)
+
+
+class _TurnMemo:
+    def __init__(self):
+        self._lock = threading.Lock()  # DB reads run in worker threads
+        self._values = {}
+        self.duplicates = defaultdict(int)
+
+    def get_or_start(self, key, start):
+        """The memoized value for key, or start() stored as its value. start() runs once per key."""
+        with self._lock:
+            if key in self._values:
+                self.duplicates[key[0]] += 1
+                return self._values[key]
+            value = self._values[key] = start()
+            return value
+
+    def lookup(self, key):
+        with self._lock:
+            if key in self._values:
+                self.duplicates[key[0]] += 1
+                return True, self._values[key]
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def forget(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for key in [k for k in self._values if k[1] == namespace]:
+                del self._values[key]
+
+
+class TurnMemoStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.duplicates_eliminated = defaultdict(int)
+
+    def record(self, duplicates):
+        with self._lock:
+            self.turns += 1
+            for name, count in duplicates.items():
+                self.duplicates_eliminated[name] += count
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "duplicates_eliminated": sum(self.duplicates_eliminated.values()),
+                "by_function": dict(self.duplicates_eliminated),
+            }
+
+
+turn_memo_stats = TurnMemoStats()
+
+
+@contextmanager
+def turn_scope():
+    memo = _TurnMemo()
+    token = _current.set(memo)
+    try:
+        yield memo
+    finally:
+        _current.reset(token)
+        turn_memo_stats.record(memo.duplicates)
+        if TURN_DEBUG and memo.duplicates:
+            print(f"[MEMO] duplicate calls eliminated this turn: {dict(memo.duplicates)}")
+
+
+def invalidate(namespace):
+    """Drops this turn's memoized results for `namespace` (e.g. after a DB write)."""
+    memo = _current.get()
+    if memo is not None:
+        memo.invalidate(namespace)
+
+
+def _key(name, namespace, args, kwargs):
+    key = (name, namespace, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def turn_memoized(namespace):
+    """Memoizes a sync or async function per turn, keyed by its arguments."""
+
+    def decorator(fn):
+        name = fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                memo = _current.get()
+                key = _key(name, namespace, args, kwargs) if memo is not None else None
+                if key is None:
+                    return await fn(*args, **kwargs)
+                # Concurrent callers share the in-flight call
+                task = memo.get_or_start(key, lambda: asyncio.ensure_future(fn(*args, **kwargs)))
+                try:
+                    result = await asyncio.shield(task)
+                except Exception:
+                    memo.forget(key)
+                    raise
+                return copy.deepcopy(result)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            memo = _current.get()
+            key = _key(name, namespace, args, kwargs) if memo is not None else None
+            if key is None:
+                return fn(*args, **kwargs)
+            # Two threads asking at the same moment may both run it; that's only a missed saving
+            found, value = memo.lookup(key)
+            if not found:
+                value = fn(*args, **kwargs)
+                memo.put(key, value)
+            return copy.deepcopy(value)
+
+        return wrapper
+
+    return decorator
+
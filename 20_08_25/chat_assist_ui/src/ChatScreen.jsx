@@ -39,8 +39,15 @@ const ChatScreen = ({ onEndChat, darkMode, assistType, autoInitiate }) => {
     setMessages(prev => [...prev, typingPlaceholder]);
     setIsTyping(true); // ⬅️ START TYPING STATE
 
+    const msgId = typingPlaceholder.id;
+    const showText = text =>
+      setMessages(prev =>
+        prev.map(msg => (msg.id === msgId ? { ...msg, isTyping: false, text } : msg))
+      );
+
     try {
-      const res = await fetch(`${API_URL}/chat`, {
+      // Reply arrives as Server-Sent Events: {"delta": ...} pieces, then {"done": true, "response": ...}
+      const res = await fetch(`${API_URL}/chat/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -48,31 +55,42 @@ const ChatScreen = ({ onEndChat, darkMode, assistType, autoInitiate }) => {
           session_id: sessionId,
         }),
       });
+      if (!res.ok) throw new Error(`chat request failed with status ${res.status}`);
 
-      const data = await res.json();
-      const reply = data.response || 'Sorry, no response received.';
-
-      const characters = reply.split('');
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
       let currentText = '';
-      const msgId = typingPlaceholder.id;
-
-      let i = 0;
-      const typeNextChar = () => {
-        if (i < characters.length) {
-          currentText += characters[i];
-          i++;
-          setMessages(prev =>
-            prev.map(msg =>
-              msg.id === msgId ? { ...msg, isTyping: false, text: currentText } : msg
-            )
-          );
-          setTimeout(typeNextChar, 20);
-        } else {
-          setIsTyping(false); // ⬅️ DONE TYPING
+      let done = false;
+
+      while (!done) {
+        const chunk = await reader.read();
+        if (chunk.done) break;
+        buffer += decoder.decode(chunk.value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue;
+          const data = JSON.parse(event.slice(6));
+          if (data.done) {
+            if (data.error) {
+              currentText = data.error;
+              showText(currentText);
+            } else if (data.replace || !currentText) {
+              currentText = data.response || 'Sorry, no response received.';
+              showText(currentText);
+            }
+            done = true;
+          } else {
+            currentText += data.delta;
+            showText(currentText);
+          }
         }
-      };
+      }
 
-      setTimeout(typeNextChar, 300);
+      if (!currentText) showText('Sorry, no response received.');
+      setIsTyping(false); // ⬅️ DONE TYPING
     } catch (err) {
       setIsTyping(false); // ⬅️ FAILSAFE
       setMessages(prev => [